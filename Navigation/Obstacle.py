@@ -13,6 +13,8 @@ class Polygon:
     def __init__(self, vertices=np.zeros((4,2))):
         self.vertices = vertices
         self.inner_vertices = None
+        # offset polygons by offset, the vertices never change after construction
+        self.inner_vertices_cache = {}
 
     def compute_distance_point_to_polygon(self, point_q, ccw):
         """
@@ -23,40 +25,24 @@ class Polygon:
         - indices of segment closest to point_q
 
         """        
-        dist = np.inf
-        segment_idx = None
-        closest_point = None
         len_polygon = self.vertices.shape[0]
-        
+        v1, v2 = self.get_edges()
+
+        # All edges at once; ties go to the last edge, as in an edge by edge scan
         if ccw:
-            for i in range(len_polygon):
-                case, seg_dist, _ = compute_distance_point_to_segment(self.vertices[(i+1) % len_polygon],self.vertices[i], point_q)
-                if seg_dist <= dist:
-                    dist = seg_dist
-                    if case == 0:
-                        closest_point = (i+1) % len_polygon
-                    elif case == 1:
-                        closest_point = (i+1) % len_polygon
-                    else:
-                        closest_point = i  
+            cases, dists, _ = compute_closest_points_on_segments(point_q, np.stack((v2, v1), axis=1))
+        else:
+            cases, dists, _ = compute_closest_points_on_segments(point_q, np.stack((v1, v2), axis=1))
+        cases, dists = cases[0], dists[0]
+        i = len_polygon - 1 - int(np.argmin(dists[::-1]))
+        dist = dists[i]
 
+        if ccw:
+            closest_point = i if cases[i] == 2 else (i+1) % len_polygon
             segment_idx = (closest_point, (closest_point+len_polygon-1) % len_polygon)
-            # print("Closest segment is {}, {}".format(segment_idx[0], segment_idx[1]))
-            
         else:
-            for i in range(len_polygon):
-                case, seg_dist, _ = compute_distance_point_to_segment(self.vertices[i],self.vertices[(i+1) % len_polygon], point_q)
-                if seg_dist <= dist:
-                    dist = seg_dist
-                    if case == 0:
-                        closest_point = i
-                    elif case == 1:
-                        closest_point = i
-                    else:
-                        closest_point = (i+1) % len_polygon   
-
+            closest_point = (i+1) % len_polygon if cases[i] == 2 else i
             segment_idx = (closest_point, (closest_point+1) % len_polygon)
-            # print("Closest segment is {}, {}".format(segment_idx[0], segment_idx[1]))
         return dist, segment_idx
 
     def compute_tangent_vector_to_polygon(self, point_q, idx):  
@@ -71,14 +57,16 @@ class Polygon:
  
         v1 = self.vertices[idx[0]]
         v2 = self.vertices[idx[1]]
-        
-        case, seg_dist, closest_point = compute_distance_point_to_segment(v1, v2, point_q)
-        
+
         tangent_vector = (v2-v1)/np.linalg.norm(v2-v1)
         
         return tangent_vector
 
     def compute_inner_vertices(self, offset):
+        if offset in self.inner_vertices_cache:
+            self.inner_vertices = self.inner_vertices_cache[offset]
+            return self.inner_vertices
+
         num_points = self.vertices.shape[0]
         candidates = []
         tangent_lines = []
@@ -110,6 +98,7 @@ class Polygon:
             
         self.inner_vertices =  polies[int(polygonArea(polies[1][:, 0], polies[1][:, 1], num_points)
                          < polygonArea(polies[0][:, 0], polies[1][:, 1], num_points))]
+        self.inner_vertices_cache[offset] = self.inner_vertices
         return self.inner_vertices
 
     # def to_display_format(self, screen_height):
@@ -117,33 +106,107 @@ class Polygon:
     #     return coordinates
 
 
-    def is_in_collision_with_points(self, points, min_dist=2.5):
-        # First check if point is within polygon
-        points_in_collision = []
-        
-        for point in points:
-            count_collisions = 0
-            p_x, p_y = point
-            for i in range(self.vertices.shape[0]-2):
-                j = i - 1 if i != 0 else self.vertices.shape[0]-2
-                v1 = self.vertices[i]
-                v2 = self.vertices[j]
+    def get_edges(self):
+        """
+        Return the start and end vertices of every polygon edge as two (n, 2) arrays
+        """
+        return self.vertices, np.roll(self.vertices, -1, axis=0)
+
+    def are_points_in_polygon(self, points):
+        """
+        Even-odd (ray crossing) test for many points at once
+
+        Method returns:
+        - boolean array with one entry per point, True if the point is inside
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        v1, v2 = self.get_edges()
+        p_x = points[:, 0:1]
+        p_y = points[:, 1:2]
 
-                if ((v1[1] > p_y) != (v2[1] > p_y)) and (p_x < (v2[0] - v1[0]) * (p_y - v1[1]) / (v2[1] - v1[1] + v1[0])):
-                    count_collisions += 1
+        # (points x edges) arrays: does a ray cast along +x from the point cross the edge
+        straddles = (v1[:, 1] > p_y) != (v2[:, 1] > p_y)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = (v2[:, 0] - v1[:, 0]) * (p_y - v1[:, 1]) / (v2[:, 1] - v1[:, 1]) + v1[:, 0]
+        crossings = np.count_nonzero(straddles & (p_x < x_cross), axis=1)
+
+        return crossings % 2 == 1
+
+    def compute_distance_points_to_polygon(self, points):
+        """
+        Distance from each point to the closest point on the polygon boundary
+        """
+        v1, v2 = self.get_edges()
+        return compute_distance_points_to_segments(points, v1, v2).min(axis=1)
+
+    def is_in_collision_with_points(self, points, min_dist=2.5):
+        """
+        A set of points is in collision if any point lies inside the polygon
+        or closer than min_dist to one of its edges
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
 
-            if count_collisions % 2 == 1:
-                points_in_collision.append(point)
+        # Only points within min_dist of the bounding box can be in collision
+        box = self.get_bounding_box(min_dist)
+        near = np.all((points >= box[:2]) & (points <= box[2:]), axis=1)
+        points = points[near]
+        if len(points) == 0:
+            return False
 
-        if len(points_in_collision):
+        # First check if point is within polygon
+        if np.any(self.are_points_in_polygon(points)):
             return True
 
         # Second check if point is in collision with edges
-        dist, _ = self.compute_distance_point_to_polygon(points[-1], False)
-        if dist < min_dist:
-            return True
+        dist = self.compute_distance_points_to_polygon(points)
+        return bool(np.any(dist < min_dist))
+
+    def are_segments_in_collision(self, start_points, end_points, min_dist=2.5):
+        """
+        Exact swept test for many segments at once
+
+        A segment is in collision if it crosses or comes closer than min_dist
+        to an edge, or lies inside the polygon (checked through its start point).
 
-        return False
+        Method returns:
+        - boolean array with one entry per segment
+        """
+        start_points = np.asarray(start_points, dtype=float).reshape(-1, 2)
+        end_points = np.asarray(end_points, dtype=float).reshape(-1, 2)
+        in_collision = np.zeros(len(start_points), dtype=bool)
+
+        # Only segments whose bounding box overlaps the polygon's can collide
+        box = self.get_bounding_box(min_dist)
+        near = (np.all(np.minimum(start_points, end_points) <= box[2:], axis=1) &
+                np.all(np.maximum(start_points, end_points) >= box[:2], axis=1))
+        if not np.any(near):
+            return in_collision
+
+        v1, v2 = self.get_edges()
+        dist = compute_distance_segments_to_segments(start_points[near], end_points[near], v1, v2).min(axis=1)
+        in_collision[near] = (dist < min_dist) | self.are_points_in_polygon(start_points[near])
+        return in_collision
+
+    def is_in_collision_with_segments(self, start_points, end_points, min_dist=2.5):
+        return bool(np.any(self.are_segments_in_collision(start_points, end_points, min_dist)))
+
+    def compute_clearance(self, points, min_dist=2.5):
+        """
+        Signed distance from each point to the region is_in_collision_with_points
+        rejects: positive outside it, zero or negative when in collision
+        """
+        dist = self.compute_distance_points_to_polygon(points)
+        inside = self.are_points_in_polygon(points)
+        return np.where(inside, -dist, dist) - min_dist
+
+    def get_bounding_box(self, min_dist=2.5):
+        """
+        Axis-aligned box (min_x, min_y, max_x, max_y) enclosing every point
+        that is_in_collision_with_points can report as colliding
+        """
+        lower = self.vertices.min(axis=0) - min_dist
+        upper = self.vertices.max(axis=0) + min_dist
+        return np.concatenate((lower, upper))
 
 
     def get_perimeter(self):
@@ -188,15 +251,37 @@ class Circle:
         self.radius = radius
 
     def is_in_collision_with_points(self, points):
-
-        dist = []
-        for point in points:
-            dx = self.center[0] - point[0]
-            dy = self.center[1] - point[1]
-
-            dist.append(dx * dx + dy * dy)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        dx = self.center[0] - points[:, 0]
+        dy = self.center[1] - points[:, 1]
+        dist = dx * dx + dy * dy
 
         if np.min(dist) <= self.radius ** 2:
             return True
 
-        return False  # safe
\ No newline at end of file
+        return False  # safe
+
+    def are_segments_in_collision(self, start_points, end_points):
+        """
+        Exact swept test for many segments at once: a segment is in collision
+        if its closest point to the centre is within the radius
+        """
+        dist = compute_distance_points_to_segments(self.center, start_points, end_points)
+        return dist[0] <= self.radius
+
+    def is_in_collision_with_segments(self, start_points, end_points):
+        return bool(np.any(self.are_segments_in_collision(start_points, end_points)))
+
+    def compute_clearance(self, points):
+        """
+        Signed distance from each point to the circle: positive outside,
+        zero or negative when in collision
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.hypot(points[:, 0] - self.center[0], points[:, 1] - self.center[1]) - self.radius
+
+    def get_bounding_box(self):
+        """
+        Axis-aligned box (min_x, min_y, max_x, max_y) enclosing the circle
+        """
+        return np.concatenate((self.center - self.radius, self.center + self.radius))
\ No newline at end of file
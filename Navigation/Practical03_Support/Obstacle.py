@@ -12,6 +12,8 @@ class Polygon:
     def __init__(self, vertices=np.zeros((4,2))):
         self.vertices = vertices
         self.inner_vertices = None
+        # offset polygons by offset, the vertices never change after construction
+        self.inner_vertices_cache = {}
 
     def compute_distance_point_to_polygon(self, point_q, ccw):
         """
@@ -78,6 +80,10 @@ class Polygon:
         return tangent_vector
 
     def compute_inner_vertices(self, offset):
+        if offset in self.inner_vertices_cache:
+            self.inner_vertices = self.inner_vertices_cache[offset]
+            return self.inner_vertices
+
         num_points = self.vertices.shape[0]
         candidates = []
         tangent_lines = []
@@ -109,6 +115,7 @@ class Polygon:
             
         self.inner_vertices =  polies[int(polygonArea(polies[1][:, 0], polies[1][:, 1], num_points)
                          < polygonArea(polies[0][:, 0], polies[1][:, 1], num_points))]
+        self.inner_vertices_cache[offset] = self.inner_vertices
         return self.inner_vertices
 
     def to_display_format(self, screen_height):
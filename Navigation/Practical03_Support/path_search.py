@@ -1,19 +1,10 @@
-import os
-import random
+import heapq
 import math
+from collections import deque
 import numpy as np
 import matplotlib.pyplot as plt
 from scipy.spatial import cKDTree
 
-# Import dependencies and set random seed
-seed_value = 5
-# 1. Set `PYTHONHASHSEED` environment variable at a fixed value
-os.environ['PYTHONHASHSEED'] = str(seed_value)
-# 2. Set `python` built-in pseudo-random generator at a fixed value
-random.seed(seed_value)
-# 3. Set `numpy` pseudo-random generator at a fixed value
-np.random.seed(seed_value)
-
 
 def find_nearest(array, value):
 	array = np.asarray(array)
@@ -45,7 +36,7 @@ def breadth_first_search(road_map, start, goal):
 	start_node = Node(vertex_start, cost=0.0, parent_index=-1,roadmap_index=idx_start)
 	goal_node = Node(vertex_goal, cost=0.0, parent_index=-1, roadmap_index=idx_goal)
 	
-	queue = [start_node]
+	queue = deque([start_node])
 	visited_nodes = {idx_start: start_node}
 	cur_idx = 0
 	
@@ -61,7 +52,7 @@ def breadth_first_search(road_map, start, goal):
 		return path
 		   
 	while queue:
-		node = queue.pop(0)
+		node = queue.popleft()
 		for idx in road_map.edges[node.idx_roadmap]:
 			if idx not in visited_nodes:
 				v = road_map.vertices[idx, :]
@@ -81,4 +72,78 @@ def breadth_first_search(road_map, start, goal):
 					goal_node.cost = cost
 					return reconstruct_path()
 				
-	return False
\ No newline at end of file
+	return False
+
+
+def get_neighbours(road_map, idx):
+	"""
+	Neighbour indices of roadmap vertex idx and the lengths of the edges to them.
+	Roadmaps that store their edge lengths (prm.RoadMap) are not recomputed.
+	"""
+	if hasattr(road_map, 'neighbours'):
+		return road_map.neighbours(idx)
+	nbrs = np.asarray(road_map.edges[idx], dtype=int)
+	return nbrs, np.linalg.norm(road_map.vertices[nbrs] - road_map.vertices[idx], axis=1)
+
+
+def _shortest_path_search(road_map, start, goal, use_heuristic):
+	vertices = np.asarray(road_map.vertices, dtype=float)
+	idx_start, vertex_start = find_nearest(vertices, start)
+	idx_goal, vertex_goal = find_nearest(vertices, goal)
+
+	# Straight-line distance to the goal vertex never overestimates the remaining cost
+	if use_heuristic:
+		heuristic = np.hypot(vertices[:, 0] - vertex_goal[0], vertices[:, 1] - vertex_goal[1]).tolist()
+	else:
+		heuristic = None
+
+	costs = {idx_start: 0.0}
+	parents = {idx_start: -1}
+	closed = set()
+	frontier = [(0.0, 0.0, idx_start)]
+
+	def reconstruct_path():
+		path = [np.array([goal[0], goal[1]])]
+		idx = idx_goal
+		while idx != -1:
+			path.append(vertices[idx].copy())
+			idx = parents[idx]
+		path.append(np.array([start[0], start[1]]))
+		return path
+
+	while frontier:
+		_, cost, idx = heapq.heappop(frontier)
+		if idx in closed:
+			continue  # stale entry, the vertex was reached more cheaply
+		if idx == idx_goal:
+			return reconstruct_path()
+		closed.add(idx)
+
+		nbrs, lengths = get_neighbours(road_map, idx)
+		for nbr, length in zip(nbrs.tolist(), lengths.tolist()):
+			new_cost = cost + length
+			if nbr in closed or new_cost >= costs.get(nbr, math.inf):
+				continue
+			costs[nbr] = new_cost
+			parents[nbr] = idx
+			priority = new_cost + heuristic[nbr] if heuristic is not None else new_cost
+			heapq.heappush(frontier, (priority, new_cost, nbr))
+
+	return False
+
+
+def dijkstra_search(road_map, start, goal):
+	"""
+	Shortest path over the roadmap between the vertices nearest to start and goal.
+	Same output as breadth_first_search: [goal, roadmap vertices from goal to start, start],
+	or False if the two vertices are not connected.
+	"""
+	return _shortest_path_search(road_map, start, goal, use_heuristic=False)
+
+
+def astar_search(road_map, start, goal):
+	"""
+	Like dijkstra_search, but guided by the straight-line distance to the goal,
+	so fewer vertices are expanded for the same optimal path
+	"""
+	return _shortest_path_search(road_map, start, goal, use_heuristic=True)
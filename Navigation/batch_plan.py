@@ -0,0 +1,236 @@
+import glob
+import json
+import os
+import time
+
+import numpy as np
+
+from rrt import RRT, RRTC
+from rrt_star import RRTStar
+from cspace import build_cspace, load_baseline
+from occupancy_grid import OccupancyGrid
+from parallel_planning import LegPlanner, LegResult, path_length
+from path_cache import file_hash
+from path_smoothing import smooth_path
+
+
+PLANNERS = {
+    "rrt": RRT,
+    "rrtc": RRTC,
+    "rrt_star": RRTStar,
+}
+
+# marker size is 70x70mm
+MARKER_SIZE = 0.07
+
+
+class CanvasFrame:
+    """
+    The GUI canvas frame: obstacles and planner parameters are in pixels of a
+    size x size canvas centred on the arena, with x pointing the opposite way
+    to the world frame
+    """
+
+    def __init__(self, arena_width, size=600):
+        self.size = size
+        self.scale = size / arena_width
+        self.transform = (-self.scale, self.scale, size / 2, size / 2)
+
+    def to_canvas(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.column_stack((self.size / 2 - points[:, 0] * self.scale,
+                                self.size / 2 + points[:, 1] * self.scale))
+
+    def to_world(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        return np.column_stack(((self.size / 2 - points[:, 0]) / self.scale,
+                                (points[:, 1] - self.size / 2) / self.scale))
+
+
+def load_waypoint_files(path):
+    """
+    Waypoint files to plan: path itself, or every .txt file in it if it is a directory
+    """
+    if os.path.isdir(path):
+        return sorted(glob.glob(os.path.join(path, '*.txt')))
+    return [path]
+
+
+def load_waypoints(waypoint_file):
+    """
+    Waypoints in world coordinates, one 'x y' line each as written by the GUI
+    """
+    return np.loadtxt(waypoint_file, ndmin=2).reshape(-1, 2)
+
+
+def summarise(times, lengths, statuses):
+    """
+    Timing and success statistics of a set of legs
+    """
+    times = np.asarray(times, dtype=float)
+    lengths = np.asarray(lengths, dtype=float)
+    statuses = np.asarray(statuses, dtype=str)
+    successes = statuses == "ok"
+    summary = {"legs": int(len(statuses)),
+               "failures": int(np.count_nonzero(~successes)),
+               "in_collision": int(np.count_nonzero(np.char.endswith(statuses, "in_collision"))),
+               "success_rate": float(np.mean(successes)) if len(statuses) else None,
+               "length_mean": float(np.mean(lengths[successes])) if np.any(successes) else None}
+    # legs with an end point in collision were not planned and have no time
+    times = times[(statuses == "ok") | (statuses == "failed")]
+    if len(times):
+        summary.update(time_total=float(np.sum(times)),
+                       time_mean=float(np.mean(times)),
+                       time_p50=float(np.percentile(times, 50)),
+                       time_p95=float(np.percentile(times, 95)),
+                       time_max=float(np.max(times)))
+    return summary
+
+
+def plan_waypoint_files(args):
+    """
+    Plan every leg of every waypoint file and return the results as a dict
+    """
+    frame = CanvasFrame(3 if args.arena == 0 else 2)
+    baseline = load_baseline(args.baseline)
+    # Same obstacles as the GUI
+    cspace = build_cspace(args.map, args.baseline,
+                          inflation=(MARKER_SIZE + baseline) / 2,
+                          include_fruit=args.include_fruit,
+                          marker_size=MARKER_SIZE,
+                          transform=frame.transform)
+    obstacles = cspace.world
+    if args.grid_res > 0:
+        obstacles = OccupancyGrid(cspace.obstacles, frame.size, frame.size, resolution=args.grid_res)
+
+    planner_kwargs = dict(width=frame.size,
+                          height=frame.size,
+                          expand_dis=args.expand_dis,
+                          path_resolution=args.path_resolution,
+                          max_points=args.max_points,
+                          continuous_collision=True,
+                          sampler=args.sampler)
+
+    # One leg per waypoint, from the previous waypoint or the start
+    scenarios = []
+    legs = []
+    statuses = []
+    for waypoint_file in load_waypoint_files(args.waypoints):
+        points = np.vstack((args.start, load_waypoints(waypoint_file)))
+        canvas = frame.to_canvas(points)
+        # The planners never finish from a start inside an obstacle, so such
+        # legs are reported instead of planned
+        in_collision = cspace.world.are_points_in_collision(canvas)
+        first = len(legs)
+        for i in range(len(points) - 1):
+            legs.append((len(legs), canvas[i], canvas[i + 1]))
+            statuses.append("start_in_collision" if in_collision[i] else
+                            "goal_in_collision" if in_collision[i + 1] else None)
+        scenarios.append((waypoint_file, points, first, len(legs)))
+
+    t0 = time.perf_counter()
+    postprocess = smooth_path if args.smooth else None
+    with LegPlanner(obstacles, PLANNERS[args.planner], planner_kwargs, postprocess,
+                    max_workers=args.workers, seed=args.seed) as pool:
+        planned = pool.plan([leg for leg, status in zip(legs, statuses) if status is None])
+    wall_time = time.perf_counter() - t0
+
+    results = [LegResult(index, None, 0.0) for index, _, _ in legs]
+    for result in planned:
+        results[result.index] = result
+        statuses[result.index] = "failed" if result.path is None else "ok"
+
+    # Paths go from start to goal, in world coordinates
+    paths = [None if result.path is None else frame.to_world(result.path[::-1]) for result in results]
+    times = [result.elapsed for result in results]
+    lengths = [path_length(path) for path in paths]
+
+    report = {"map": args.map,
+              "map_hash": file_hash(args.map),
+              "planner": args.planner,
+              "params": dict(planner_kwargs, seed=args.seed, smooth=args.smooth,
+                             grid_res=args.grid_res, include_fruit=args.include_fruit),
+              "workers": args.workers,
+              "wall_time": wall_time,
+              "summary": summarise(times, lengths, statuses),
+              "scenarios": []}
+    for waypoint_file, points, first, last in scenarios:
+        report["scenarios"].append({
+            "waypoints": waypoint_file,
+            "summary": summarise(times[first:last], lengths[first:last], statuses[first:last]),
+            "legs": [{"status": statuses[i],
+                      "start": points[i - first].tolist(),
+                      "goal": points[i - first + 1].tolist(),
+                      "path": None if paths[i] is None else paths[i].tolist(),
+                      "length": lengths[i] if paths[i] is not None else None,
+                      "time": times[i]}
+                     for i in range(first, last)]})
+    return report
+
+
+def write_json(report, out_file):
+    with open(out_file, 'w') as f:
+        json.dump(report, f, indent=2)
+
+
+def write_npz(report, out_file):
+    """
+    Flat arrays, one entry per leg, with all path points packed into path_points
+    and leg i's points at path_points[path_offsets[i]:path_offsets[i+1]]
+    (empty for failed legs). The rest of the report is stored as a JSON string.
+    """
+    legs = [(s, leg) for s, scenario in enumerate(report["scenarios"]) for leg in scenario["legs"]]
+    paths = [np.asarray(leg["path"] or np.empty((0, 2)), dtype=float).reshape(-1, 2) for _, leg in legs]
+    offsets = np.zeros(len(paths) + 1, dtype=np.int64)
+    np.cumsum([len(path) for path in paths], out=offsets[1:])
+
+    meta = dict(report)
+    meta["scenarios"] = [{"waypoints": scenario["waypoints"], "summary": scenario["summary"]}
+                         for scenario in report["scenarios"]]
+    np.savez(out_file,
+             leg_scenario=np.array([s for s, _ in legs], dtype=np.int64),
+             leg_start=np.array([leg["start"] for _, leg in legs], dtype=float).reshape(-1, 2),
+             leg_goal=np.array([leg["goal"] for _, leg in legs], dtype=float).reshape(-1, 2),
+             leg_time=np.array([leg["time"] for _, leg in legs], dtype=float),
+             leg_length=np.array([np.nan if leg["length"] is None else leg["length"] for _, leg in legs]),
+             leg_success=np.array([leg["path"] is not None for _, leg in legs], dtype=bool),
+             leg_status=np.array([leg["status"] for _, leg in legs], dtype=str),
+             path_points=np.vstack(paths) if paths else np.empty((0, 2)),
+             path_offsets=offsets,
+             meta=np.array(json.dumps(meta)))
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Plan waypoint files without the GUI")
+    parser.add_argument("--arena", metavar='', type=int, default=0)
+    parser.add_argument("--map", metavar='', type=str, default='M4_true_map.txt')
+    parser.add_argument("--baseline", metavar='', type=str, default='baseline.txt')
+    parser.add_argument("--waypoints", metavar='', type=str, default='waypoints.txt',
+                        help="waypoint file or directory of .txt waypoint files")
+    parser.add_argument("--start", metavar='', type=float, nargs=2, default=[0.0, 0.0])
+    parser.add_argument("--planner", metavar='', type=str, default='rrt', choices=sorted(PLANNERS))
+    parser.add_argument("--sampler", metavar='', type=str, default='goal_bias')
+    parser.add_argument("--expand_dis", metavar='', type=float, default=100)
+    parser.add_argument("--path_resolution", metavar='', type=float, default=0.1)
+    parser.add_argument("--max_points", metavar='', type=int, default=200)
+    parser.add_argument("--grid_res", metavar='', type=float, default=0)
+    parser.add_argument("--include_fruit", action='store_true')
+    parser.add_argument("--smooth", action='store_true')
+    parser.add_argument("--workers", metavar='', type=int, default=0,
+                        help="worker processes, 0 plans in this process")
+    parser.add_argument("--seed", metavar='', type=int, default=0)
+    parser.add_argument("--out", metavar='', type=str, default='paths.json',
+                        help="output file, .json or .npz")
+    args = parser.parse_args()
+
+    report = plan_waypoint_files(args)
+    if args.out.endswith('.npz'):
+        write_npz(report, args.out)
+    else:
+        write_json(report, args.out)
+
+    summary = report["summary"]
+    print(f"{summary.get('legs', 0)} legs, {summary.get('failures', 0)} failed, "
+          f"{report['wall_time']:.2f} s -> {args.out}")
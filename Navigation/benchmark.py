@@ -0,0 +1,448 @@
+import json
+import platform
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import numpy as np
+
+from Obstacle import Circle, Rectangle
+from batch_plan import PLANNERS, MARKER_SIZE, CanvasFrame
+from collision_world import CollisionWorld, ObstacleProxy
+from cspace import build_cspace, load_baseline
+from parallel_planning import path_length
+from prm import sample_free_vertices
+from spatial_index import NEAREST_NEIGHBOUR_BACKENDS, BruteForceIndex, make_nearest_neighbour_index
+
+
+Scenario = namedtuple("Scenario", ["family", "index", "obstacles", "start", "goal", "width", "height"])
+Regression = namedtuple("Regression", ["key", "metric", "baseline", "current"])
+
+# Scenarios are in the pixel frame of the GUI canvas, where the obstacles'
+# collision margins are sized
+WIDTH = 600
+HEIGHT = 600
+
+# Metrics compared against a baseline. Counts are deterministic for a given
+# seed. Wall times are not, so they are only compared on request, with a looser
+# relative tolerance and an absolute floor below which increases are noise.
+COUNT_METRICS = ("nodes_mean", "collision_checks_mean", "length_mean")
+TIME_METRICS = ("time_p50", "time_mean")
+
+
+class CollisionCounter(ObstacleProxy):
+    """
+    Obstacle proxy that counts the collision queries made through it
+    """
+
+    def __init__(self, obstacles):
+        super().__init__(obstacles)
+        self.reset()
+
+    def reset(self):
+        self.point_queries = 0
+        self.points = 0
+        self.segment_queries = 0
+        self.segments = 0
+
+    @property
+    def queries(self):
+        return self.point_queries + self.segment_queries
+
+    def is_in_collision_with_points(self, points):
+        self.point_queries += 1
+        self.points += len(points)
+        return super().is_in_collision_with_points(points)
+
+    def is_in_collision_with_segments(self, start_points, end_points):
+        self.segment_queries += 1
+        self.segments += len(start_points)
+        return super().is_in_collision_with_segments(start_points, end_points)
+
+
+class RecordingIndex(BruteForceIndex):
+    """
+    Brute-force index that records the queries made to it, so they can be
+    replayed on the other nearest neighbour backends
+
+    Every clear, i.e. every tree a planner builds, starts a new trace in traces.
+    Copies for a second tree (RRTC) record into the same traces.
+    """
+
+    def __init__(self, traces):
+        self.traces = traces
+        self.trace = []
+        super().__init__()
+
+    def __deepcopy__(self, memo):
+        return RecordingIndex(self.traces)
+
+    def clear(self):
+        super().clear()
+        self.trace = []
+        self.traces.append(self.trace)
+
+    def add(self, x, y):
+        ind = super().add(x, y)
+        self.trace.append(("add", (x, y), ind))
+        return ind
+
+    def nearest(self, x, y):
+        ind = super().nearest(x, y)
+        self.trace.append(("nearest", (x, y), ind))
+        return ind
+
+    def near(self, x, y, radius):
+        inds = super().near(x, y, radius)
+        self.trace.append(("near", (x, y, radius), inds))
+        return inds
+
+
+def sample_start_goal(obstacles, rng, start_box, goal_box):
+    """
+    Collision-free start and goal drawn uniformly from two (x, y, width, height) boxes
+    """
+    points = []
+    for x, y, width, height in (start_box, goal_box):
+        free = sample_free_vertices(obstacles, width, height, 1, rng=rng, origin=(x, y))
+        if len(free) == 0:
+            raise ValueError("No collision-free point in box {}".format((x, y, width, height)))
+        points.append(free[0])
+    return points
+
+
+def make_random_circles(rng, count=30, min_radius=15, max_radius=50):
+    """
+    Circles of random size scattered over the area, start on the left and goal on the right
+    """
+    centres = rng.random((count, 2)) * (WIDTH, HEIGHT)
+    radii = rng.uniform(min_radius, max_radius, count)
+    obstacles = [Circle(x, y, r) for (x, y), r in zip(centres, radii)]
+    start, goal = sample_start_goal(obstacles, rng, (0, 0, WIDTH / 6, HEIGHT),
+                                    (WIDTH * 5 / 6, 0, WIDTH / 6, HEIGHT))
+    return obstacles, start, goal
+
+
+def make_wall(x, thickness, gap_y, gap):
+    """
+    Vertical wall across the area at x with an opening of size gap centred on gap_y
+    """
+    # a Rectangle extends from its origin towards smaller y
+    lower = Rectangle(np.array([x, gap_y - gap / 2]), thickness, gap_y - gap / 2)
+    upper = Rectangle(np.array([x, HEIGHT]), thickness, HEIGHT - gap_y - gap / 2)
+    return [lower, upper]
+
+
+def make_polygon_maze(rng, walls=4, thickness=20, gap=60):
+    """
+    Parallel walls with openings at random heights, so the path has to zigzag
+    """
+    obstacles = []
+    spacing = WIDTH / (walls + 1)
+    for i in range(walls):
+        gap_y = rng.uniform(gap, HEIGHT - gap)
+        obstacles.extend(make_wall(spacing * (i + 1) - thickness / 2, thickness, gap_y, gap))
+    start, goal = sample_start_goal(obstacles, rng, (0, 0, spacing / 2, HEIGHT),
+                                    (WIDTH - spacing / 2, 0, spacing / 2, HEIGHT))
+    return obstacles, start, goal
+
+
+def make_narrow_passage(rng, thickness=40, gap=20):
+    """
+    Single thick wall with an opening barely wider than the collision margins
+    """
+    gap_y = rng.uniform(2 * gap, HEIGHT - 2 * gap)
+    obstacles = make_wall((WIDTH - thickness) / 2, thickness, gap_y, gap)
+    start, goal = sample_start_goal(obstacles, rng, (0, 0, WIDTH / 4, HEIGHT),
+                                    (WIDTH * 3 / 4, 0, WIDTH / 4, HEIGHT))
+    return obstacles, start, goal
+
+
+def make_m4_map(rng, map_file='M4_true_map.txt', baseline_file='baseline.txt'):
+    """
+    The markers of the bundled map as the GUI plans around them, between random free points
+    """
+    frame = CanvasFrame(3, size=WIDTH)
+    cspace = build_cspace(map_file, baseline_file,
+                          inflation=(MARKER_SIZE + load_baseline(baseline_file)) / 2,
+                          include_fruit=False, marker_size=MARKER_SIZE, transform=frame.transform)
+    obstacles = cspace.obstacles
+    start, goal = sample_start_goal(obstacles, rng, (0, 0, WIDTH, HEIGHT / 4),
+                                    (0, HEIGHT * 3 / 4, WIDTH, HEIGHT / 4))
+    return obstacles, start, goal
+
+
+SCENARIO_FAMILIES = {
+    "random_circles": make_random_circles,
+    "polygon_maze": make_polygon_maze,
+    "narrow_passage": make_narrow_passage,
+    "m4_map": make_m4_map,
+}
+
+
+def make_scenarios(family, count, seed=0):
+    """
+    count scenarios of a family. Scenario i only depends on the family name,
+    i and seed, so adding families or scenarios leaves the others unchanged.
+    """
+    scenarios = []
+    for index in range(count):
+        rng = np.random.default_rng([seed, zlib.crc32(family.encode()), index])
+        obstacles, start, goal = SCENARIO_FAMILIES[family](rng)
+        scenarios.append(Scenario(family, index, CollisionWorld(obstacles),
+                                  np.asarray(start, dtype=float), np.asarray(goal, dtype=float),
+                                  WIDTH, HEIGHT))
+    return scenarios
+
+
+def count_nodes(planner):
+    """
+    Number of nodes the planner added to its trees
+    """
+    if hasattr(planner, "start_tree"):
+        return len(planner.start_tree) + len(planner.end_tree)
+    return len(planner.tree)
+
+
+def run_planner(scenario, planner_name, seed, planner_kwargs, timeout=None):
+    """
+    Plan a scenario once and return its measurements as a dict
+    timeout: seconds after which the planner is stopped through its stop event
+    """
+    counter = CollisionCounter(scenario.obstacles)
+    planner = PLANNERS[planner_name](start=scenario.start, goal=scenario.goal, obstacle_list=counter,
+                                     width=scenario.width, height=scenario.height, rng=seed,
+                                     **planner_kwargs)
+    timer = None
+    if timeout is not None:
+        planner.stop_event = threading.Event()
+        timer = threading.Timer(timeout, planner.stop_event.set)
+        timer.start()
+
+    t0 = time.perf_counter()
+    path = planner.planning()
+    elapsed = time.perf_counter() - t0
+    if timer is not None:
+        timer.cancel()
+
+    return {"family": scenario.family,
+            "scenario": scenario.index,
+            "planner": planner_name,
+            "seed": seed,
+            "success": path is not None,
+            "timed_out": planner.is_stopped(),
+            "time": elapsed,
+            "nodes": count_nodes(planner),
+            "collision_checks": counter.queries,
+            "checked_points": counter.points + counter.segments,
+            "length": path_length(path) if path is not None else None}
+
+
+def summarise_runs(runs):
+    """
+    Statistics of the runs of every family and planner, keyed "family/planner"
+    """
+    groups = {}
+    for run in runs:
+        groups.setdefault("{}/{}".format(run["family"], run["planner"]), []).append(run)
+
+    summary = {}
+    for key, group in groups.items():
+        times = np.array([run["time"] for run in group])
+        lengths = [run["length"] for run in group if run["success"]]
+        summary[key] = {"runs": len(group),
+                        "success_rate": float(np.mean([run["success"] for run in group])),
+                        "time_mean": float(np.mean(times)),
+                        "time_p50": float(np.percentile(times, 50)),
+                        "time_p95": float(np.percentile(times, 95)),
+                        "nodes_mean": float(np.mean([run["nodes"] for run in group])),
+                        "collision_checks_mean": float(np.mean([run["collision_checks"] for run in group])),
+                        "length_mean": float(np.mean(lengths)) if lengths else None}
+    return summary
+
+
+def run_benchmark(families, planners, scenarios=4, seeds=5, seed=0, planner_kwargs=None, timeout=None):
+    """
+    Run every planner with every seed on every scenario of the families.
+    Returns the results as a dict with the individual runs and their summary.
+    """
+    planner_kwargs = dict(planner_kwargs or {})
+    runs = []
+    for family in families:
+        for scenario in make_scenarios(family, scenarios, seed):
+            for planner_name in planners:
+                for planner_seed in range(seeds):
+                    runs.append(run_planner(scenario, planner_name, planner_seed, planner_kwargs, timeout))
+
+    return {"meta": {"families": list(families),
+                     "planners": list(planners),
+                     "scenarios": scenarios,
+                     "seeds": seeds,
+                     "seed": seed,
+                     "planner_kwargs": planner_kwargs,
+                     "timeout": timeout,
+                     "python": platform.python_version(),
+                     "numpy": np.__version__,
+                     "machine": platform.machine()},
+            "summary": summarise_runs(runs),
+            "runs": runs}
+
+
+def run_nearest_neighbour_benchmark(families, planners, scenarios=4, seeds=5, seed=0, planner_kwargs=None):
+    """
+    Time the nearest neighbour backends on the queries the planners make
+
+    The planners run once with a RecordingIndex, then every backend replays the
+    recorded adds and queries.
+    Returns the results as a dict with the replay time of every backend and
+    whether it gave the same answers as the recording.
+    """
+    planner_kwargs = dict(planner_kwargs or {})
+    traces = []
+    for family in families:
+        for scenario in make_scenarios(family, scenarios, seed):
+            for planner_name in planners:
+                for planner_seed in range(seeds):
+                    kwargs = dict(planner_kwargs, nn_backend=RecordingIndex(traces))
+                    PLANNERS[planner_name](start=scenario.start, goal=scenario.goal,
+                                           obstacle_list=scenario.obstacles,
+                                           width=scenario.width, height=scenario.height,
+                                           rng=planner_seed, **kwargs).planning()
+
+    backends = {}
+    for backend in NEAREST_NEIGHBOUR_BACKENDS:
+        elapsed = 0.0
+        identical = True
+        for trace in traces:
+            index = make_nearest_neighbour_index(backend)
+            t0 = time.perf_counter()
+            answers = [getattr(index, name)(*args) for name, args, _ in trace]
+            elapsed += time.perf_counter() - t0
+            identical &= answers == [answer for _, _, answer in trace]
+        backends[backend] = {"time": elapsed, "identical": identical}
+
+    return {"meta": {"families": list(families),
+                     "planners": list(planners),
+                     "scenarios": scenarios,
+                     "seeds": seeds,
+                     "seed": seed,
+                     "planner_kwargs": planner_kwargs},
+            "trees": len(traces),
+            "queries": sum(name != "add" for trace in traces for name, _, _ in trace),
+            "max_tree_size": max((sum(name == "add" for name, _, _ in trace) for trace in traces), default=0),
+            "backends": backends}
+
+
+def compare_results(current, baseline, tolerance=0.05, time_tolerance=0.25, success_tolerance=0.05,
+                    check_times=False, time_floor=0.01):
+    """
+    Regressions of current against baseline, both as returned by run_benchmark
+
+    tolerance: allowed relative increase of nodes, collision checks and path length
+    time_tolerance: allowed relative increase of the wall times
+    success_tolerance: allowed absolute drop of the success rate
+    check_times: also compare the wall times. They vary from run to run and
+                 machine to machine, so by default only the deterministic
+                 metrics are compared.
+    time_floor: wall time increases of up to this many seconds are never
+                regressions, whatever the relative increase
+    Summary entries missing from current are regressions too.
+    """
+    for name in ("scenarios", "seeds", "seed", "planner_kwargs"):
+        if current["meta"][name] != baseline["meta"][name]:
+            raise ValueError("Results were run with different {}: {} and {}".format(
+                name, current["meta"][name], baseline["meta"][name]))
+    regressions = []
+    for key, base in baseline["summary"].items():
+        if key not in current["summary"]:
+            regressions.append(Regression(key, "missing", base["runs"], 0))
+            continue
+        now = current["summary"][key]
+        if now["success_rate"] < base["success_rate"] - success_tolerance:
+            regressions.append(Regression(key, "success_rate", base["success_rate"], now["success_rate"]))
+        checks = [(COUNT_METRICS, tolerance, 0.0)]
+        if check_times:
+            checks.append((TIME_METRICS, time_tolerance, time_floor))
+        for metrics, allowed, floor in checks:
+            for metric in metrics:
+                if base[metric] is None or now[metric] is None:
+                    continue
+                if now[metric] > base[metric] * (1 + allowed) and now[metric] - base[metric] > floor:
+                    regressions.append(Regression(key, metric, base[metric], now[metric]))
+    return regressions
+
+
+def print_summary(results):
+    print("{:<32}{:>8}{:>10}{:>10}{:>10}{:>10}{:>10}".format(
+        "family/planner", "success", "p50 ms", "p95 ms", "nodes", "checks", "length"))
+    for key, stats in sorted(results["summary"].items()):
+        print("{:<32}{:>8.2f}{:>10.1f}{:>10.1f}{:>10.0f}{:>10.0f}{:>10}".format(
+            key, stats["success_rate"], 1000 * stats["time_p50"], 1000 * stats["time_p95"],
+            stats["nodes_mean"], stats["collision_checks_mean"],
+            "-" if stats["length_mean"] is None else "{:.0f}".format(stats["length_mean"])))
+
+
+if __name__ == '__main__':
+    import argparse
+    import sys
+
+    parser = argparse.ArgumentParser(description="Benchmark the planners on reproducible scenarios")
+    parser.add_argument("--families", metavar='', type=str, nargs='+', default=list(SCENARIO_FAMILIES),
+                        choices=list(SCENARIO_FAMILIES))
+    parser.add_argument("--planners", metavar='', type=str, nargs='+', default=sorted(PLANNERS),
+                        choices=sorted(PLANNERS))
+    parser.add_argument("--scenarios", metavar='', type=int, default=4, help="scenarios per family")
+    parser.add_argument("--seeds", metavar='', type=int, default=5, help="planner seeds per scenario")
+    parser.add_argument("--seed", metavar='', type=int, default=0, help="seed of the scenarios")
+    parser.add_argument("--sampler", metavar='', type=str, default='goal_bias')
+    parser.add_argument("--expand_dis", metavar='', type=float, default=100)
+    parser.add_argument("--path_resolution", metavar='', type=float, default=0.1)
+    parser.add_argument("--max_points", metavar='', type=int, default=1000)
+    parser.add_argument("--timeout", metavar='', type=float, default=10, help="seconds per run")
+    parser.add_argument("--out", metavar='', type=str, default='benchmark.json')
+    parser.add_argument("--compare", metavar='', type=str, default='',
+                        help="baseline results to check for regressions")
+    parser.add_argument("--tolerance", metavar='', type=float, default=0.05)
+    parser.add_argument("--check_times", action='store_true',
+                        help="also count slower wall times as regressions")
+    parser.add_argument("--time_tolerance", metavar='', type=float, default=0.25)
+    parser.add_argument("--time_floor", metavar='', type=float, default=0.01,
+                        help="seconds of wall time increase that are never regressions")
+    parser.add_argument("--nearest_neighbours", action='store_true',
+                        help="compare the nearest neighbour backends instead of the planners")
+    args = parser.parse_args()
+
+    planner_kwargs = dict(expand_dis=args.expand_dis,
+                          path_resolution=args.path_resolution,
+                          max_points=args.max_points,
+                          continuous_collision=True,
+                          sampler=args.sampler)
+    if args.nearest_neighbours:
+        results = run_nearest_neighbour_benchmark(args.families, args.planners, args.scenarios,
+                                                  args.seeds, args.seed, planner_kwargs)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print("{} trees of up to {} nodes, {} queries".format(
+            results["trees"], results["max_tree_size"], results["queries"]))
+        for backend, stats in results["backends"].items():
+            print("{:<8}{:>10.1f} ms{}".format(backend, 1000 * stats["time"],
+                                              "" if stats["identical"] else "  DIFFERENT ANSWERS"))
+        sys.exit(0)
+
+    results = run_benchmark(args.families, args.planners, args.scenarios, args.seeds, args.seed,
+                            planner_kwargs, args.timeout)
+    with open(args.out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print_summary(results)
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            baseline = json.load(f)
+        regressions = compare_results(results, baseline, args.tolerance, args.time_tolerance,
+                                      check_times=args.check_times, time_floor=args.time_floor)
+        for regression in regressions:
+            print("REGRESSION {}: {} {} -> {}".format(*regression))
+        if regressions:
+            sys.exit(1)
+        print("No regressions against {}".format(args.compare))
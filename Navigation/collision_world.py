@@ -0,0 +1,221 @@
+import math
+import numpy as np
+
+
+class CollisionWorld:
+    """
+    Collision checking against a fixed set of obstacles with broad-phase culling
+
+    Takes a mixed list of Circle/Polygon/Rectangle obstacles once, precomputes
+    their axis-aligned bounding boxes and buckets them into a uniform grid.
+    A query only runs the narrow-phase test of obstacles whose box overlaps the
+    query points, and only with the points that fall inside that box.
+
+    The world behaves like a single obstacle (is_in_collision_with_points and
+    is_in_collision_with_segments), so it can be passed to RRT in place of a raw obstacle list. Iterating over it
+    yields the original obstacles.
+    """
+
+    def __init__(self, obstacle_list, cell_size=None):
+        self.obstacles = list(obstacle_list)
+        if self.obstacles:
+            self.boxes = np.array([obs.get_bounding_box() for obs in self.obstacles], dtype=float)
+        else:
+            self.boxes = np.empty((0, 4))
+
+        if cell_size is None:
+            # Cells about the size of a typical obstacle keep every bucket short
+            extents = np.maximum(self.boxes[:, 2] - self.boxes[:, 0], self.boxes[:, 3] - self.boxes[:, 1])
+            cell_size = float(np.median(extents)) if len(extents) else 1.0
+            if cell_size <= 0:
+                cell_size = 1.0
+        self.cell_size = cell_size
+
+        self.cells = {}
+        for ind, box in enumerate(self.boxes):
+            for cell in self._cells_in_box(box[:2], box[2:]):
+                self.cells.setdefault(cell, []).append(ind)
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def __iter__(self):
+        return iter(self.obstacles)
+
+    def __getitem__(self, index):
+        return self.obstacles[index]
+
+    def _cell_range(self, lower, upper):
+        return (math.floor(lower[0] / self.cell_size), math.floor(lower[1] / self.cell_size),
+                math.floor(upper[0] / self.cell_size), math.floor(upper[1] / self.cell_size))
+
+    def _cells_in_box(self, lower, upper):
+        i_min, j_min, i_max, j_max = self._cell_range(lower, upper)
+        for i in range(i_min, i_max + 1):
+            for j in range(j_min, j_max + 1):
+                yield i, j
+
+    def query_box(self, lower, upper):
+        """
+        Return the indices of obstacles whose bounding box overlaps [lower, upper]
+        """
+        i_min, j_min, i_max, j_max = self._cell_range(lower, upper)
+
+        candidates = set()
+        if (i_max - i_min + 1) * (j_max - j_min + 1) > len(self.cells):
+            # Query covers more cells than are occupied, walk the occupied ones instead
+            for (i, j), bucket in self.cells.items():
+                if i_min <= i <= i_max and j_min <= j <= j_max:
+                    candidates.update(bucket)
+        else:
+            for cell in self._cells_in_box(lower, upper):
+                bucket = self.cells.get(cell)
+                if bucket is not None:
+                    candidates.update(bucket)
+
+        overlapping = []
+        for ind in sorted(candidates):
+            box = self.boxes[ind]
+            if box[0] <= upper[0] and lower[0] <= box[2] and box[1] <= upper[1] and lower[1] <= box[3]:
+                overlapping.append(ind)
+        return overlapping
+
+    def is_in_collision_with_points(self, points):
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(points) == 0:
+            return False
+
+        for ind in self.query_box(points.min(axis=0), points.max(axis=0)):
+            box = self.boxes[ind]
+            inside = np.all((points >= box[:2]) & (points <= box[2:]), axis=1)
+            if np.any(inside) and self.obstacles[ind].is_in_collision_with_points(points[inside]):
+                return True
+
+        return False  # safe
+
+    def is_in_collision_with_segments(self, start_points, end_points):
+        start_points = np.asarray(start_points, dtype=float).reshape(-1, 2)
+        end_points = np.asarray(end_points, dtype=float).reshape(-1, 2)
+        if len(start_points) == 0:
+            return False
+
+        lower = np.minimum(start_points, end_points)
+        upper = np.maximum(start_points, end_points)
+        for ind in self.query_box(lower.min(axis=0), upper.max(axis=0)):
+            box = self.boxes[ind]
+            near = np.all(lower <= box[2:], axis=1) & np.all(upper >= box[:2], axis=1)
+            if np.any(near) and self.obstacles[ind].is_in_collision_with_segments(start_points[near], end_points[near]):
+                return True
+
+        return False  # safe
+
+    def are_points_in_collision(self, points):
+        """
+        Boolean mask, True for every point inside an obstacle or on its boundary
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        in_collision = np.zeros(len(points), dtype=bool)
+        if len(points) == 0:
+            return in_collision
+
+        for ind in self.query_box(points.min(axis=0), points.max(axis=0)):
+            box = self.boxes[ind]
+            inside = np.all((points >= box[:2]) & (points <= box[2:]), axis=1) & ~in_collision
+            if np.any(inside):
+                in_collision[inside] = self.obstacles[ind].compute_clearance(points[inside]) <= 0
+        return in_collision
+
+    def are_segments_in_collision(self, start_points, end_points):
+        """
+        Boolean mask, True for every segment that collides with an obstacle
+        """
+        start_points = np.asarray(start_points, dtype=float).reshape(-1, 2)
+        end_points = np.asarray(end_points, dtype=float).reshape(-1, 2)
+        in_collision = np.zeros(len(start_points), dtype=bool)
+        if len(start_points) == 0:
+            return in_collision
+
+        lower = np.minimum(start_points, end_points)
+        upper = np.maximum(start_points, end_points)
+        for ind in self.query_box(lower.min(axis=0), upper.max(axis=0)):
+            box = self.boxes[ind]
+            near = np.all(lower <= box[2:], axis=1) & np.all(upper >= box[:2], axis=1) & ~in_collision
+            if np.any(near):
+                in_collision[near] = self.obstacles[ind].are_segments_in_collision(start_points[near], end_points[near])
+        return in_collision
+
+
+def query_points(obstacles, points):
+    """
+    True if any of the points collides with an obstacle list or a single
+    obstacle-like object such as a CollisionWorld or OccupancyGrid
+    """
+    if hasattr(obstacles, "is_in_collision_with_points"):
+        return obstacles.is_in_collision_with_points(points)
+    return any(obs.is_in_collision_with_points(points) for obs in obstacles)
+
+
+def query_segments(obstacles, start_points, end_points):
+    """
+    True if any of the segments collides with an obstacle list or obstacle-like object
+    """
+    if hasattr(obstacles, "is_in_collision_with_segments"):
+        return obstacles.is_in_collision_with_segments(start_points, end_points)
+    return any(obs.is_in_collision_with_segments(start_points, end_points) for obs in obstacles)
+
+
+def are_points_in_collision(obstacles, points):
+    """
+    Boolean mask of the points that collide with an obstacle list or obstacle-like object
+    """
+    if hasattr(obstacles, "are_points_in_collision"):
+        return obstacles.are_points_in_collision(points)
+    in_collision = np.zeros(len(points), dtype=bool)
+    for obs in obstacles:
+        free = ~in_collision
+        in_collision[free] = obs.compute_clearance(points[free]) <= 0
+    return in_collision
+
+
+def are_segments_in_collision(obstacles, start_points, end_points):
+    """
+    Boolean mask of the segments that collide with an obstacle list or obstacle-like object
+    """
+    if hasattr(obstacles, "are_segments_in_collision"):
+        return obstacles.are_segments_in_collision(start_points, end_points)
+    in_collision = np.zeros(len(start_points), dtype=bool)
+    for obs in obstacles:
+        free = ~in_collision
+        in_collision[free] = obs.are_segments_in_collision(start_points[free], end_points[free])
+    return in_collision
+
+
+class ObstacleProxy:
+    """
+    Obstacle-like object that forwards collision queries to an obstacle list
+    or obstacle-like object
+
+    Planners treat it as a single obstacle-like object, like a CollisionWorld.
+    Subclasses override the queries to observe them, e.g. to count or time them.
+    """
+
+    def __init__(self, obstacles):
+        self.obstacles = obstacles
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def __iter__(self):
+        return iter(self.obstacles)
+
+    def is_in_collision_with_points(self, points):
+        return query_points(self.obstacles, points)
+
+    def is_in_collision_with_segments(self, start_points, end_points):
+        return query_segments(self.obstacles, start_points, end_points)
+
+    def are_points_in_collision(self, points):
+        return are_points_in_collision(self.obstacles, points)
+
+    def are_segments_in_collision(self, start_points, end_points):
+        return are_segments_in_collision(self.obstacles, start_points, end_points)
@@ -0,0 +1,99 @@
+import json
+
+import numpy as np
+
+from Obstacle import Circle, Rectangle
+from collision_world import CollisionWorld
+from path_cache import file_hash
+
+
+# Built configuration spaces by (map hash, baseline hash, settings)
+_cspace_cache = {}
+
+
+class ConfigurationSpace:
+    """
+    Inflated obstacles of a map file, ready for planning
+
+    obstacles: Rectangle per marker and optionally Circle per fruit, grown by
+               the inflation radius so the robot can be planned as a point
+    names: map file key of every obstacle
+    world: CollisionWorld over the obstacles
+    map_hash: content hash of the map file the obstacles were built from
+    """
+
+    def __init__(self, obstacles, names, inflation, map_hash):
+        self.obstacles = obstacles
+        self.names = names
+        self.inflation = inflation
+        self.map_hash = map_hash
+        self.world = CollisionWorld(obstacles)
+
+    def __len__(self):
+        return len(self.obstacles)
+
+    def __iter__(self):
+        return iter(self.obstacles)
+
+
+def load_baseline(baseline_file='baseline.txt'):
+    """
+    Wheel baseline of the robot in metres, as written by the calibration
+    """
+    return float(np.loadtxt(baseline_file, delimiter=','))
+
+
+def build_cspace(map_file='M4_true_map.txt', baseline_file='baseline.txt', inflation=None,
+                 include_fruit=True, marker_size=0.07, fruit_radius=0.0, transform=None):
+    """
+    Build the configuration space of a map file, memoised on the content of
+    the map and baseline files and on the settings
+
+    inflation: radius the obstacles are grown by, half the robot baseline by default
+    include_fruit: add a Circle of radius fruit_radius + inflation per fruit
+    marker_size: side of the square markers in metres
+    transform: (scale_x, scale_y, offset_x, offset_y) mapping map coordinates
+               in metres to the planning frame as offset + scale * coordinate,
+               e.g. (-s, s, w/2, h/2) for the GUI canvas. None keeps metres.
+
+    Repeated calls with unchanged files return the same ConfigurationSpace
+    object, so its obstacles, grid and cached offset polygons are shared.
+    """
+    if transform is None:
+        transform = (1.0, 1.0, 0.0, 0.0)
+    transform = tuple(float(t) for t in transform)
+
+    key = (file_hash(map_file), file_hash(baseline_file) if inflation is None else None,
+           inflation, include_fruit, marker_size, fruit_radius, transform)
+    if key not in _cspace_cache:
+        if inflation is None:
+            inflation = load_baseline(baseline_file) / 2
+        with open(map_file, 'r') as f:
+            markers = json.load(f)
+        _cspace_cache[key] = _make_cspace(markers, inflation, include_fruit, marker_size,
+                                          fruit_radius, transform, key[0])
+    return _cspace_cache[key]
+
+
+def _make_cspace(markers, inflation, include_fruit, marker_size, fruit_radius, transform, map_hash):
+    scale_x, scale_y, offset_x, offset_y = transform
+    obstacles = []
+    names = []
+    for name, loc in markers.items():
+        x = offset_x + scale_x * loc['x']
+        y = offset_y + scale_y * loc['y']
+        if name.startswith('aruco'):
+            half_x = abs(scale_x) * (marker_size / 2 + inflation)
+            half_y = abs(scale_y) * (marker_size / 2 + inflation)
+            # a Rectangle extends from its origin towards smaller y
+            obstacles.append(Rectangle(np.array([x - half_x, y + half_y]), 2 * half_x, 2 * half_y))
+        elif include_fruit:
+            obstacles.append(Circle(x, y, abs(scale_x) * (fruit_radius + inflation)))
+        else:
+            continue
+        names.append(name)
+    return ConfigurationSpace(obstacles, names, inflation, map_hash)
+
+
+def clear_cspace_cache():
+    _cspace_cache.clear()
@@ -0,0 +1,278 @@
+import copy
+import inspect
+import time
+
+from collision_world import ObstacleProxy
+from spatial_index import make_nearest_neighbour_index
+
+
+# Planner methods timed as planning phases, wrapped when the planner has them
+PLANNER_PHASES = {
+    "sampling": "get_random_node",
+    "steering": "steer",
+    "collision": "is_collision_free",
+    "choose_parent": "add_node_with_best_parent",
+    "rewiring": "rewire",
+}
+
+# Nearest neighbour index methods timed as phases
+INDEX_PHASES = {
+    "nearest_neighbour": "nearest",
+    "near_neighbours": "near",
+    "index_insert": "add",
+}
+
+
+class PlanningStats:
+    """
+    Call counts and cumulative times of the phases of one planning call
+
+    Phases nest: "collision" includes the "obstacle_points" and
+    "obstacle_segments" queries it makes and RRT*'s "choose_parent" and
+    "rewiring" include their own collision checks, so phase times do not add
+    up to total_time.
+
+    iterations: samples drawn, one per iteration of the planning loop
+    iterations_to_first_solution: samples drawn when the first path was
+                                  found, None if none was
+    collision_checks / collision_rejections: nodes checked by the planner and
+                                             those found in collision
+    """
+
+    def __init__(self):
+        self.calls = {}
+        self.times = {}
+        self.collision_checks = 0
+        self.collision_rejections = 0
+        self.iterations_to_first_solution = None
+        self.total_time = 0.0
+        self.profile = None
+
+    @property
+    def iterations(self):
+        return self.calls.get("sampling", 0)
+
+    @property
+    def rejection_rate(self):
+        if self.collision_checks == 0:
+            return 0.0
+        return self.collision_rejections / self.collision_checks
+
+    def record(self, phase, elapsed):
+        self.calls[phase] = self.calls.get(phase, 0) + 1
+        self.times[phase] = self.times.get(phase, 0.0) + elapsed
+
+    def solution_found(self):
+        if self.iterations_to_first_solution is None:
+            self.iterations_to_first_solution = self.iterations
+
+    def as_dict(self):
+        return {"total_time": self.total_time,
+                "iterations": self.iterations,
+                "iterations_to_first_solution": self.iterations_to_first_solution,
+                "collision_checks": self.collision_checks,
+                "collision_rejections": self.collision_rejections,
+                "rejection_rate": self.rejection_rate,
+                "phases": {phase: {"calls": self.calls[phase], "time": self.times[phase]}
+                           for phase in self.calls}}
+
+    def __str__(self):
+        lines = ["{:<20}{:>10}{:>12}{:>10}".format("phase", "calls", "time ms", "share")]
+        for phase in sorted(self.times, key=self.times.get, reverse=True):
+            share = self.times[phase] / self.total_time if self.total_time > 0 else 0.0
+            lines.append("{:<20}{:>10}{:>12.2f}{:>10.1%}".format(
+                phase, self.calls[phase], 1000 * self.times[phase], share))
+        lines.append("total {:.2f} ms, {} iterations, first solution after {}, "
+                     "{:.1%} of {} collision checks rejected".format(
+                         1000 * self.total_time, self.iterations, self.iterations_to_first_solution,
+                         self.rejection_rate, self.collision_checks))
+        return "\n".join(lines)
+
+
+def _timed(stats, phase, method):
+    def wrapper(*args, **kwargs):
+        t0 = time.perf_counter()
+        result = method(*args, **kwargs)
+        stats.record(phase, time.perf_counter() - t0)
+        return result
+    return wrapper
+
+
+class InstrumentedIndex:
+    """
+    Nearest neighbour index that times the queries to the index it wraps
+
+    Planners deep-copy their backend for a second tree (RRTC); copies keep
+    recording into the same stats.
+    """
+
+    def __init__(self, index, stats):
+        self.index = index
+        self.stats = stats
+        for phase, name in INDEX_PHASES.items():
+            if hasattr(index, name):
+                setattr(self, name, _timed(stats, phase, getattr(index, name)))
+
+    def __len__(self):
+        return len(self.index)
+
+    def clear(self):
+        self.index.clear()
+
+    def __deepcopy__(self, memo):
+        return InstrumentedIndex(copy.deepcopy(self.index, memo), self.stats)
+
+
+class InstrumentedObstacles(ObstacleProxy):
+    """
+    Obstacle proxy that times the collision queries made through it
+    """
+
+    def __init__(self, obstacles, stats):
+        super().__init__(obstacles)
+        self.stats = stats
+
+    def is_in_collision_with_points(self, points):
+        t0 = time.perf_counter()
+        in_collision = super().is_in_collision_with_points(points)
+        self.stats.record("obstacle_points", time.perf_counter() - t0)
+        return in_collision
+
+    def is_in_collision_with_segments(self, start_points, end_points):
+        t0 = time.perf_counter()
+        in_collision = super().is_in_collision_with_segments(start_points, end_points)
+        self.stats.record("obstacle_segments", time.perf_counter() - t0)
+        return in_collision
+
+
+def instrument(planner, stats=None):
+    """
+    Record the phases of planner's planning calls into stats
+
+    The methods are wrapped on this planner instance only, so planners that
+    are not instrumented run the unmodified class code. Returns the stats and
+    a function that removes the instrumentation again.
+    """
+    if stats is None:
+        stats = PlanningStats()
+
+    wrapped = []
+    for phase, name in PLANNER_PHASES.items():
+        if hasattr(planner, name):
+            setattr(planner, name, _timed(stats, phase, getattr(planner, name)))
+            wrapped.append(name)
+
+    check = planner.is_collision_free
+
+    def is_collision_free(new_node):
+        collision_free = check(new_node)
+        if new_node is not None:
+            stats.collision_checks += 1
+            stats.collision_rejections += not collision_free
+        return collision_free
+    planner.is_collision_free = is_collision_free
+
+    nn_backend = planner.nn_backend
+    backend = nn_backend
+    if isinstance(backend, str):
+        backend = make_nearest_neighbour_index(backend)
+    planner.nn_backend = InstrumentedIndex(backend, stats)
+
+    obstacle_list = planner.obstacle_list
+    planner.obstacle_list = InstrumentedObstacles(obstacle_list, stats)
+
+    def remove():
+        for name in wrapped:
+            del planner.__dict__[name]
+        planner.nn_backend = nn_backend
+        planner.obstacle_list = obstacle_list
+
+    return stats, remove
+
+
+def plan_with_stats(planner, profile=None, **planning_kwargs):
+    """
+    Run planner.planning(**planning_kwargs) instrumented and return (path, stats)
+
+    profile: None, "cprofile" or "pyinstrument" to also profile the call.
+             stats.profile is then a pstats.Stats or a pyinstrument Profiler.
+             Profiling slows planning down, so phase times are inflated.
+    """
+    stats, remove = instrument(planner)
+
+    callback = planning_kwargs.get("callback")
+    if "callback" in inspect.signature(planner.planning).parameters:
+        # anytime planners report every improved path, the first one is the first solution
+        def on_solution(path, cost):
+            stats.solution_found()
+            if callback is not None:
+                callback(path, cost)
+        planning_kwargs["callback"] = on_solution
+
+    profiler = None
+    if profile == "cprofile":
+        import cProfile
+        profiler = cProfile.Profile()
+    elif profile == "pyinstrument":
+        import pyinstrument
+        profiler = pyinstrument.Profiler()
+    elif profile is not None:
+        raise ValueError("Unknown profiler: {}".format(profile))
+
+    try:
+        if profile == "cprofile":
+            profiler.enable()
+        elif profile == "pyinstrument":
+            profiler.start()
+        t0 = time.perf_counter()
+        path = planner.planning(**planning_kwargs)
+        stats.total_time = time.perf_counter() - t0
+    finally:
+        if profile == "cprofile":
+            profiler.disable()
+        elif profile == "pyinstrument":
+            profiler.stop()
+        remove()
+
+    if path is not None:
+        # planners without a callback return as soon as they find a path
+        stats.solution_found()
+    if profile == "cprofile":
+        import pstats
+        stats.profile = pstats.Stats(profiler)
+    else:
+        stats.profile = profiler
+    return path, stats
+
+
+if __name__ == '__main__':
+    import argparse
+
+    from batch_plan import PLANNERS
+    from benchmark import SCENARIO_FAMILIES, make_scenarios
+
+    parser = argparse.ArgumentParser(description="Break one planning call down into its phases")
+    parser.add_argument("--family", metavar='', type=str, default='m4_map', choices=list(SCENARIO_FAMILIES))
+    parser.add_argument("--scenario", metavar='', type=int, default=0)
+    parser.add_argument("--planner", metavar='', type=str, default='rrt', choices=sorted(PLANNERS))
+    parser.add_argument("--seed", metavar='', type=int, default=0)
+    parser.add_argument("--expand_dis", metavar='', type=float, default=100)
+    parser.add_argument("--path_resolution", metavar='', type=float, default=0.1)
+    parser.add_argument("--max_points", metavar='', type=int, default=1000)
+    parser.add_argument("--profile", metavar='', type=str, default=None, choices=["cprofile", "pyinstrument"])
+    args = parser.parse_args()
+
+    scenario = make_scenarios(args.family, args.scenario + 1)[args.scenario]
+    planner = PLANNERS[args.planner](start=scenario.start, goal=scenario.goal,
+                                     obstacle_list=scenario.obstacles,
+                                     width=scenario.width, height=scenario.height,
+                                     expand_dis=args.expand_dis, path_resolution=args.path_resolution,
+                                     max_points=args.max_points, continuous_collision=True,
+                                     sampler="goal_bias", rng=args.seed)
+    path, stats = plan_with_stats(planner, profile=args.profile)
+    print("path found" if path is not None else "no path found")
+    print(stats)
+    if args.profile == "cprofile":
+        stats.profile.sort_stats("cumulative").print_stats(20)
+    elif args.profile == "pyinstrument":
+        print(stats.profile.output_text())
@@ -15,11 +15,7 @@ def is_point_in_segment(start_seg, end_seg, point_q):
     """ 
         Determines in point_q is strictly inside the segment defined by start_seg and end_seg
     """
-    dist_1 = compute_distance_between_points(start_seg, point_q)
-    dist_2 = compute_distance_between_points(end_seg, point_q)
-    dist_3 = compute_distance_between_points(start_seg, end_seg)
-     
-    return dist_1 + dist_2 == dist_3
+    return bool(are_points_in_segments(point_q, [[start_seg, end_seg]])[0, 0])
 
 
 def compute_lines_intersection(line_1, line_2):
@@ -36,13 +32,9 @@ def compute_lines_intersection(line_1, line_2):
     line_1 = <a, b, c>
     line_2 = <a1, b1, c1>
     """
-    d  = line_1[0] * line_2[1] - line_1[1] * line_2[0]
-    dx = line_1[2] * line_2[1] - line_1[1] * line_2[2]
-    dy = line_1[0] * line_2[2] - line_1[2] * line_2[0]
-    if d != 0:
-        x = dx / d
-        y = dy / d
-        return np.array([x,y])
+    intersection = compute_lines_intersections([line_1], [line_2])[0]
+    if np.all(np.isfinite(intersection)):
+        return intersection
     return False
 
 
@@ -76,47 +68,12 @@ def compute_distance_point_to_line_by_intersection(start_line, end_line, point_q
     (i.e, orthogonal projection of point_q onto the line) and computing
     the distance between (x0,y0) and point_q
     
-    (x0, y0) coordinates are computed by considering the intersection between
-    two perpendicular lines. The first line is defined by the points start_line
-    and end_line. The second line is perpendicular to the first one and goes through
-    point_q
-    
+    Returns False if start_line and end_line coincide
     """
-
-    # Put point_q in right format
-    point_q = np.array(point_q)
-    
-    # Compute first line parameters
-    first_line = compute_line_through_points(start_line, end_line)
-           
-    if first_line:
-        a, b, c = first_line
-        
-        # Normalize parameters so that a*a + b*b = 1
-        ab_norm = np.linalg.norm(np.array([a, b]))
-        a_norm = a / ab_norm
-        b_norm = b / ab_norm
-        
-        # Define a norm vector perpendicular to first line
-        # This vector is parallel to the line that goes through point_q
-        normal = np.array([a_norm, b_norm])
-
-        # Using the vector-form equation of a line, to find a second in line 2
-        point_q2 = point_q + 2*(normal)
-        
-        # Using point_q and point_q2, find the standard parameters of second line
-        second_line = compute_line_through_points(point_q, point_q2)
-        if second_line:
-
-            # Compute intersection point
-            proj_point = compute_lines_intersection(first_line, second_line)
-            
-            if proj_point is not None:
-                # Compute distance between point_q and its projection onto first line
-                distance = compute_distance_between_points(proj_point, point_q)
-                return proj_point, distance
-            
-    return False
+    proj_points, distances = compute_distance_points_to_lines(point_q, [[start_line, end_line]])
+    if np.isnan(distances[0, 0]):
+        return False
+    return proj_points[0, 0], float(distances[0, 0])
 
 
 def compute_distance_point_to_segment(start_seg, end_seg, point_q):
@@ -127,7 +84,7 @@ def compute_distance_point_to_segment(start_seg, end_seg, point_q):
     to the line defined by start_seg and end_seg.
     
     If proj_point_q is stricly inside the segment, it returns the distance
-    to the line and the indicator w=1
+    to the line and the indicator w=0
     
     If proj_point_q is not in the segment, it determines the closest segment
     point to point_q, computes the distance between point_q and the chosen segment point
@@ -136,26 +93,173 @@ def compute_distance_point_to_segment(start_seg, end_seg, point_q):
     end_seg is the closest point and w=2
     
     """
-    
-    # Compute point_q projection and distance from point_q to projection
-    proj_q, distance = compute_distance_point_to_line_by_intersection(start_seg, end_seg, point_q)
-    
-    # Compute distance to start and end of segment
-    dist_to_start = compute_distance_between_points(start_seg, point_q)
-    dist_to_end = compute_distance_between_points(end_seg, point_q)
-    
-    if is_point_in_segment(start_seg, end_seg, proj_q):
-        w = 0  # orthogonal projection is the closest point
-    elif dist_to_start < dist_to_end:
-        w = 1 # start is the closest point in segment
-        distance = dist_to_start
-        proj_q = start_seg
-    else:
-        w = 2 # end is the closest point in segment
-        distance = dist_to_end
-        proj_q = end_seg
-                
-    return w, distance, proj_q
+    cases, distances, closest_points = compute_closest_points_on_segments(point_q, [[start_seg, end_seg]])
+    return int(cases[0, 0]), float(distances[0, 0]), closest_points[0, 0]
+
+
+def _as_segments(segments):
+    """
+    Split an (M, 2, 2) array of (start, end) rows into (M, 2) start and end arrays
+    """
+    segments = np.asarray(segments, dtype=float).reshape(-1, 2, 2)
+    return segments[:, 0], segments[:, 1]
+
+
+def _project_points_onto_segments(points, start_segs, end_segs):
+    """
+    Position t of the orthogonal projection of every point onto the line of
+    every segment, 0 at the start and 1 at the end (0 for zero-length segments),
+    with the segment vectors, their squared lengths and the offsets of the
+    points from the segment starts
+    """
+    seg = end_segs - start_segs
+    seg_len_sq = np.einsum('ij,ij->i', seg, seg)
+    rel = points[:, None, :] - start_segs[None, :, :]
+    dot = rel[..., 0] * seg[:, 0] + rel[..., 1] * seg[:, 1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        t = np.where(seg_len_sq > 0, dot / seg_len_sq, 0.0)
+    return t, seg, seg_len_sq, rel
+
+
+def compute_lines_intersections(lines_1, lines_2):
+    """
+    Batch version of compute_lines_intersection
+
+    lines_1, lines_2: (N, 3) arrays of lines <a, b, c> in standard form
+    Returns an (N, 2) array with the intersection of lines_1[i] and lines_2[i],
+    NaN where the two lines are parallel
+    """
+    l1 = np.asarray(lines_1, dtype=float).reshape(-1, 3)
+    l2 = np.asarray(lines_2, dtype=float).reshape(-1, 3)
+    d = l1[:, 0] * l2[:, 1] - l1[:, 1] * l2[:, 0]
+    dx = l1[:, 2] * l2[:, 1] - l1[:, 1] * l2[:, 2]
+    dy = l1[:, 0] * l2[:, 2] - l1[:, 2] * l2[:, 0]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intersections = np.column_stack((dx / d, dy / d))
+    intersections[d == 0] = np.nan
+    return intersections
+
+
+def compute_distance_points_to_lines(points, segments):
+    """
+    Batch version of compute_distance_point_to_line_by_intersection
+
+    points: (N, 2) array
+    segments: (M, 2, 2) array, each (start, end) pair defines a line
+    Returns the (N, M, 2) orthogonal projections of the points onto the lines
+    and the (N, M) distances to them. Both are NaN for lines whose two points
+    coincide.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    start_segs, end_segs = _as_segments(segments)
+    t, seg, seg_len_sq, rel = _project_points_onto_segments(points, start_segs, end_segs)
+    t = np.where(np.all(np.isclose(start_segs, end_segs), axis=1), np.nan, t)
+    proj_points = start_segs[None, :, :] + t[..., None] * seg[None, :, :]
+    distances = np.hypot(rel[..., 0] - t * seg[:, 0], rel[..., 1] - t * seg[:, 1])
+    return proj_points, distances
+
+
+def compute_closest_points_on_segments(points, segments):
+    """
+    Batch version of compute_distance_point_to_segment
+
+    points: (N, 2) array
+    segments: (M, 2, 2) array of (start, end) pairs
+    Returns (cases, distances, closest_points) with shapes (N, M), (N, M) and
+    (N, M, 2). The case codes are those of compute_distance_point_to_segment:
+    0 when the orthogonal projection falls strictly inside the segment, 1 when
+    the start is the closest point and 2 when the end is.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    start_segs, end_segs = _as_segments(segments)
+    t, seg, seg_len_sq, rel = _project_points_onto_segments(points, start_segs, end_segs)
+
+    dist_to_start = np.hypot(rel[..., 0], rel[..., 1])
+    dist_to_end = np.hypot(points[:, None, 0] - end_segs[:, 0], points[:, None, 1] - end_segs[:, 1])
+    dist_to_line = np.hypot(rel[..., 0] - t * seg[:, 0], rel[..., 1] - t * seg[:, 1])
+
+    inside = (t > 0) & (t < 1)
+    cases = np.where(inside, 0, np.where(dist_to_start < dist_to_end, 1, 2))
+    distances = np.choose(cases, (dist_to_line, dist_to_start, dist_to_end))
+
+    proj_points = start_segs[None, :, :] + t[..., None] * seg[None, :, :]
+    closest_points = np.where((cases == 0)[..., None], proj_points,
+                              np.where((cases == 1)[..., None], start_segs[None, :, :], end_segs[None, :, :]))
+    return cases, distances, closest_points
+
+
+def are_points_in_segments(points, segments):
+    """
+    Batch version of is_point_in_segment
+
+    points: (N, 2) array
+    segments: (M, 2, 2) array of (start, end) pairs
+    Returns an (N, M) boolean array, True where the point lies on the segment,
+    end points included, up to floating point tolerance
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    start_segs, end_segs = _as_segments(segments)
+    dist_1 = np.hypot(points[:, None, 0] - start_segs[:, 0], points[:, None, 1] - start_segs[:, 1])
+    dist_2 = np.hypot(points[:, None, 0] - end_segs[:, 0], points[:, None, 1] - end_segs[:, 1])
+    dist_3 = np.hypot(*(end_segs - start_segs).T)
+    return np.isclose(dist_1 + dist_2, dist_3)
+
+
+def compute_distance_points_to_segments(points, start_segs, end_segs):
+    """
+    Vectorised distance from every point to every segment
+
+    points: (N, 2) array
+    start_segs, end_segs: (M, 2) arrays with the segment end points
+    Returns an (N, M) array of Euclidean distances. The closest point is found
+    by clamping the orthogonal projection onto each segment, so zero-length
+    segments reduce to point distances.
+    """
+    points = np.asarray(points, dtype=float).reshape(-1, 2)
+    start_segs = np.asarray(start_segs, dtype=float).reshape(-1, 2)
+    end_segs = np.asarray(end_segs, dtype=float).reshape(-1, 2)
+
+    t, seg, seg_len_sq, rel = _project_points_onto_segments(points, start_segs, end_segs)
+    t = np.clip(t, 0.0, 1.0)
+    dx = rel[..., 0] - t * seg[:, 0]
+    dy = rel[..., 1] - t * seg[:, 1]
+    return np.hypot(dx, dy)
+
+
+def compute_distance_segments_to_segments(start_segs_a, end_segs_a, start_segs_b, end_segs_b):
+    """
+    Vectorised minimum distance between every segment of set A and every segment of set B
+
+    start_segs_a, end_segs_a: (N, 2) arrays
+    start_segs_b, end_segs_b: (M, 2) arrays
+    Returns an (N, M) array, zero where the segments intersect. Otherwise the
+    closest pair of points involves an end point of one of the segments, so the
+    distance is the smallest of the four end point to segment distances.
+    """
+    a0 = np.asarray(start_segs_a, dtype=float).reshape(-1, 2)
+    a1 = np.asarray(end_segs_a, dtype=float).reshape(-1, 2)
+    b0 = np.asarray(start_segs_b, dtype=float).reshape(-1, 2)
+    b1 = np.asarray(end_segs_b, dtype=float).reshape(-1, 2)
+
+    dist = np.minimum(compute_distance_points_to_segments(a0, b0, b1),
+                      compute_distance_points_to_segments(a1, b0, b1))
+    dist = np.minimum(dist, compute_distance_points_to_segments(b0, a0, a1).T)
+    dist = np.minimum(dist, compute_distance_points_to_segments(b1, a0, a1).T)
+
+    def cross(u, v):
+        return u[..., 0] * v[..., 1] - u[..., 1] * v[..., 0]
+
+    # Proper crossings: each segment's end points lie on opposite sides of the other
+    seg_a = (a1 - a0)[:, None, :]
+    seg_b = (b1 - b0)[None, :, :]
+    side_b0 = cross(seg_a, b0[None, :, :] - a0[:, None, :])
+    side_b1 = cross(seg_a, b1[None, :, :] - a0[:, None, :])
+    side_a0 = cross(seg_b, a0[:, None, :] - b0[None, :, :])
+    side_a1 = cross(seg_b, a1[:, None, :] - b0[None, :, :])
+    crossing = (side_b0 * side_b1 < 0) & (side_a0 * side_a1 < 0)
+    dist[crossing] = 0.0
+
+    return dist
 
 
 def get_direction_from_points(p1, p2):
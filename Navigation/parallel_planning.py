@@ -0,0 +1,255 @@
+import concurrent.futures
+import math
+import multiprocessing
+import threading
+import time
+from collections import namedtuple
+
+import numpy as np
+
+from rrt import RRT
+
+
+LegResult = namedtuple("LegResult", ["index", "path", "elapsed"])
+RaceResult = namedtuple("RaceResult", ["path", "attempt", "cost", "elapsed"])
+
+# Set once per worker process by _init_worker, so the obstacle world is sent to
+# every worker a single time instead of being pickled with each task
+_worker_context = None
+
+
+def _init_worker(obstacles, planner, planner_kwargs, postprocess, stop_event=None):
+    global _worker_context
+    _worker_context = (obstacles, planner, planner_kwargs, postprocess, stop_event)
+
+
+def _plan_leg(index, start, end, seed):
+    return _plan_leg_in(_worker_context, index, start, end, seed)
+
+
+def _plan_leg_in(context, index, start, end, seed):
+    obstacles, planner, planner_kwargs, postprocess, stop_event = context
+    t0 = time.perf_counter()
+    rrt = planner(start=np.array(start, dtype=float), goal=np.array(end, dtype=float),
+                  obstacle_list=obstacles, rng=seed, **planner_kwargs)
+    rrt.stop_event = stop_event
+    path = rrt.planning()
+    if postprocess is not None:
+        path = postprocess(path, obstacles)
+    return LegResult(index, path, time.perf_counter() - t0)
+
+
+def leg_seed(seed, index):
+    """
+    Deterministic seed of leg index, independent of which worker plans it
+    """
+    return int(np.random.SeedSequence((seed, index)).generate_state(1)[0])
+
+
+class LegPlanner:
+    """
+    Plans independent route legs in parallel on a process pool
+
+    Every worker process receives the obstacle world, the planner class and its
+    keyword arguments once, when it starts. Tasks only carry the leg index, its
+    end points and its seed. The seed of a leg depends only on the base seed and
+    the leg index, so the same legs give the same paths whatever the number of
+    workers or the order in which they finish.
+
+    The workers also share one stop event with the pool, which the planners
+    check every iteration, so cancel() stops legs that are already running
+    instead of leaving them to finish.
+    """
+
+    def __init__(self, obstacles, planner=RRT, planner_kwargs=None, postprocess=None,
+                 max_workers=None, seed=0):
+        """
+        obstacles: obstacle list or obstacle-like object shared by all legs
+        planner: planner class, constructed as planner(start, goal, obstacle_list, rng, **planner_kwargs)
+        postprocess: optional callable(path, obstacles) applied to each path, e.g. smooth_path.
+                     Must be importable at module level so it can be sent to the workers.
+                     The same holds for planner, and scripts using worker processes
+                     need an if __name__ == '__main__' guard, as workers are spawned.
+        max_workers: number of processes, defaults to the number of cores.
+                     0 plans the legs one by one in this process, with the same seeds.
+        seed: base seed the per-leg seeds are derived from
+        """
+        self.seed = seed
+        self.executor = None
+        if max_workers == 0:
+            self.stop_event = threading.Event()
+        else:
+            # Workers are spawned rather than forked: the GUI starts them from its
+            # planning thread, and forking a multithreaded process can deadlock
+            mp_context = multiprocessing.get_context("spawn")
+            self.stop_event = mp_context.Event()
+        self.context = (obstacles, planner, dict(planner_kwargs or {}), postprocess, self.stop_event)
+        if max_workers != 0:
+            self.executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=max_workers, mp_context=mp_context, initializer=_init_worker,
+                initargs=self.context)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+
+    def submit(self, legs):
+        """
+        Submit (index, start, end) legs and return one future per leg.
+        Each future resolves to a LegResult.
+        """
+        if self.executor is None:
+            futures = []
+            for index, start, end in legs:
+                future = concurrent.futures.Future()
+                future.set_result(_plan_leg_in(self.context, index, tuple(start), tuple(end),
+                                               leg_seed(self.seed, index)))
+                futures.append(future)
+            return futures
+        return [self.executor.submit(_plan_leg, index, tuple(start), tuple(end),
+                                     leg_seed(self.seed, index))
+                for index, start, end in legs]
+
+    def plan(self, legs):
+        """
+        Plan (index, start, end) legs and return their LegResults in the order given
+        """
+        return [future.result() for future in self.submit(legs)]
+
+    def cancel(self, futures):
+        """
+        Cancel the legs of futures: legs that have not started are dropped and
+        running ones are stopped. Returns once none of them is running, after
+        which the pool plans new legs normally again.
+
+        The stop event is shared by all legs, so legs of other submissions that
+        are running at the same time are stopped too.
+        """
+        futures = [future for future in futures if not future.cancel()]
+        if futures:
+            self.stop_event.set()
+            concurrent.futures.wait(futures)
+        self.stop_event.clear()
+
+    def race(self, start, end, attempts=4, mode="first", deadline=None):
+        """
+        Run several attempts of the same leg with different seeds in parallel
+        and keep one of them
+
+        The run time of a sampling planner varies a lot between seeds, and an
+        unlucky seed can run out of nodes without a path. Racing attempts cuts
+        both the tail latency and the failure rate.
+
+        mode: "first" returns the first successful attempt and stops the others.
+              "best" waits for all attempts, or until the deadline, and returns
+              the shortest path. Attempts still running at the deadline are
+              stopped through the stop event; anytime planners such as RRTStar
+              then return the best path they have so far, which is considered too.
+        deadline: wall-clock budget in seconds, None waits for the attempts to finish
+
+        Returns a RaceResult(path, attempt, cost, elapsed); path is None and
+        attempt -1 when no attempt found a path in time. The attempt seeds are
+        reproducible, which attempt wins in "first" mode depends on timing.
+        Without worker processes the attempts run one after the other.
+        """
+        if mode not in ("first", "best"):
+            raise ValueError("Unknown race mode: {}".format(mode))
+
+        t0 = time.perf_counter()
+        legs = [(attempt, start, end) for attempt in range(attempts)]
+        results = []
+        if self.executor is None:
+            timer = None
+            if deadline is not None:
+                timer = threading.Timer(deadline, self.stop_event.set)
+                timer.start()
+            try:
+                for leg in legs:
+                    result = self.plan([leg])[0]
+                    if result.path is not None:
+                        results.append(result)
+                        if mode == "first":
+                            break
+                    if self.stop_event.is_set():
+                        break
+            finally:
+                if timer is not None:
+                    timer.cancel()
+                self.stop_event.clear()
+        else:
+            futures = self.submit(legs)
+            try:
+                for future in concurrent.futures.as_completed(futures, timeout=deadline):
+                    result = future.result()
+                    if result.path is not None:
+                        results.append(result)
+                        if mode == "first":
+                            break
+            except concurrent.futures.TimeoutError:
+                pass
+            finally:
+                # drop queued attempts, stop running ones and wait for them to return
+                self.cancel(futures)
+
+            if mode == "best":
+                # attempts stopped at the deadline may still have returned a path
+                seen = {result.index for result in results}
+                for future in futures:
+                    if not future.cancelled():
+                        result = future.result()
+                        if result.path is not None and result.index not in seen:
+                            results.append(result)
+
+        elapsed = time.perf_counter() - t0
+        if not results:
+            return RaceResult(None, -1, math.inf, elapsed)
+        best = min(results, key=lambda result: path_length(result.path))
+        return RaceResult(best.path, best.index, path_length(best.path), elapsed)
+
+    def shutdown(self, cancel=False):
+        """
+        Stop the worker processes. With cancel=True legs that have not started
+        are dropped and running ones are stopped.
+        """
+        if self.executor is not None:
+            if cancel:
+                self.stop_event.set()
+            self.executor.shutdown(wait=True, cancel_futures=cancel)
+
+
+def plan_legs(waypoints, obstacles, planner=RRT, planner_kwargs=None, postprocess=None,
+              max_workers=None, seed=0):
+    """
+    Plan the route through consecutive waypoints, one leg per pair, in parallel.
+    Returns the paths of the legs in order, None for legs without a path.
+    """
+    legs = [(i, waypoints[i], waypoints[i + 1]) for i in range(len(waypoints) - 1)]
+    with LegPlanner(obstacles, planner, planner_kwargs, postprocess, max_workers, seed) as pool:
+        return [result.path for result in pool.plan(legs)]
+
+
+def path_length(path):
+    """
+    Length of a polyline path, inf for None
+    """
+    if path is None:
+        return math.inf
+    path = np.asarray(path, dtype=float)
+    return float(np.sum(np.hypot(*np.diff(path, axis=0).T)))
+
+
+def race_plan(start, end, obstacles, planner=RRT, planner_kwargs=None, postprocess=None,
+              attempts=4, mode="first", deadline=None, max_workers=None, seed=0):
+    """
+    Race attempts of one leg on a new LegPlanner, see LegPlanner.race.
+    To race many legs, keep one LegPlanner and call its race method instead,
+    so the worker processes and the obstacles are only set up once.
+
+    max_workers: number of processes, defaults to min(attempts, number of cores)
+    """
+    if max_workers is None:
+        max_workers = min(attempts, multiprocessing.cpu_count())
+    with LegPlanner(obstacles, planner, planner_kwargs, postprocess, max_workers, seed) as pool:
+        return pool.race(start, end, attempts, mode, deadline)
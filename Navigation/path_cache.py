@@ -0,0 +1,135 @@
+import hashlib
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+def file_hash(path):
+    """
+    Hex digest of the contents of a file, e.g. a map file
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def obstacle_hash(obstacles):
+    """
+    Hex digest of the geometry of an obstacle list or obstacle-like object
+    (CollisionWorld, OccupancyGrid). Equal obstacle sets give equal digests
+    across runs, so the digest can key paths stored on disk.
+    """
+    digest = hashlib.sha1()
+    _update_hash(digest, obstacles)
+    return digest.hexdigest()
+
+
+def _update_hash(digest, obj):
+    digest.update(type(obj).__name__.encode())
+    if hasattr(obj, "vertices"):
+        digest.update(np.ascontiguousarray(obj.vertices, dtype=float).tobytes())
+    elif hasattr(obj, "center"):
+        digest.update(np.array([obj.center[0], obj.center[1], obj.radius], dtype=float).tobytes())
+    elif hasattr(obj, "obstacles"):
+        # settings of an occupancy grid change which paths are collision free
+        for name in ("width", "height", "resolution", "conservative", "max_distance"):
+            if hasattr(obj, name):
+                digest.update(repr(getattr(obj, name)).encode())
+        _update_hash(digest, obj.obstacles)
+    else:
+        for obs in obj:
+            _update_hash(digest, obs)
+
+
+class PathCache:
+    """
+    LRU cache of planned legs
+
+    A leg is keyed by its start and goal quantised to a grid of size quantum,
+    a hash of the obstacle set (see obstacle_hash) and the planner parameters.
+    Endpoints in the same quantisation cell share a path, so a cached path may
+    start and end up to quantum/2 from the requested points in each axis.
+
+    Up to capacity paths are kept in memory, the least recently used is evicted
+    first. With a directory every path is also written there as a JSON file and
+    memory misses fall back to it, so paths survive restarts. Only successful
+    paths should be stored: planner failures are random and worth retrying.
+    """
+
+    def __init__(self, capacity=256, quantum=1.0, directory=None):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.quantum = quantum
+        self.directory = directory
+        self.paths = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __contains__(self, key):
+        return key in self.paths or (self.directory is not None
+                                     and os.path.exists(self._file(key)))
+
+    def make_key(self, start, goal, obstacles_hash, params=None):
+        """
+        Key of the leg from start to goal
+        obstacles_hash: digest from obstacle_hash
+        params: planner parameters, e.g. the keyword arguments of the planner
+        """
+        quantised = [[int(round(float(c) / self.quantum)) for c in point[:2]]
+                     for point in (start, goal)]
+        data = json.dumps([quantised, obstacles_hash, params or {}], sort_keys=True, default=repr)
+        return hashlib.sha1(data.encode()).hexdigest()
+
+    def _file(self, key):
+        return os.path.join(self.directory, key + ".json")
+
+    def get(self, key):
+        """
+        Cached path for key, or None on a miss
+        """
+        if key in self.paths:
+            self.paths.move_to_end(key)
+            self.hits += 1
+            return self.paths[key]
+
+        if self.directory is not None and os.path.exists(self._file(key)):
+            with open(self._file(key), 'r') as f:
+                path = json.load(f)["path"]
+            self._remember(key, path)
+            self.hits += 1
+            return path
+
+        self.misses += 1
+        return None
+
+    def put(self, key, path):
+        path = np.asarray(path, dtype=float).tolist()
+        self._remember(key, path)
+        if self.directory is not None:
+            # write to a temporary file first so a crash never leaves a partial path
+            tmp = self._file(key) + ".tmp"
+            with open(tmp, 'w') as f:
+                json.dump({"path": path}, f)
+            os.replace(tmp, self._file(key))
+
+    def _remember(self, key, path):
+        self.paths[key] = path
+        self.paths.move_to_end(key)
+        while len(self.paths) > self.capacity:
+            self.paths.popitem(last=False)
+
+    def clear(self):
+        """
+        Drop the in-memory paths; files on disk are kept
+        """
+        self.paths.clear()
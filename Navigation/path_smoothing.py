@@ -0,0 +1,113 @@
+import numpy as np
+from scipy import interpolate
+
+from collision_world import query_segments
+from math_functions import compute_distance_points_to_segments
+
+
+def is_segment_collision_free(obstacles, start, end):
+    """
+    Exact check of straight segments (start and end may be (n, 2) arrays)
+    against an obstacle list or a single obstacle-like object such as a
+    CollisionWorld or OccupancyGrid
+    """
+    return not query_segments(obstacles, start, end)
+
+
+def shortcut_path(path, obstacles, iterations=0, rng=None):
+    """
+    Remove detours by connecting path vertices directly where the straight
+    segment between them is collision free
+
+    With iterations=0 the path is shortcut greedily: from each kept vertex jump
+    to the furthest vertex it can see. Otherwise iterations random pairs of
+    vertices are tried and the vertices between them dropped when their
+    connection is free, drawing the pairs from rng (a np.random.Generator or
+    seed). End points are always kept.
+    """
+    path = np.asarray(path, dtype=float)
+    if len(path) < 3:
+        return path.tolist()
+
+    if iterations == 0:
+        kept = [0]
+        i = 0
+        while i < len(path) - 1:
+            j = len(path) - 1
+            while j > i + 1 and not is_segment_collision_free(obstacles, path[i], path[j]):
+                j -= 1
+            kept.append(j)
+            i = j
+        return path[kept].tolist()
+
+    rng = np.random.default_rng(rng)
+    path = list(path)
+    for _ in range(iterations):
+        if len(path) < 3:
+            break
+        i, j = sorted(rng.choice(len(path), 2, replace=False))
+        if j - i < 2:
+            continue
+        if is_segment_collision_free(obstacles, path[i], path[j]):
+            path = path[:i + 1] + path[j:]
+    return np.array(path).tolist()
+
+
+def prune_collinear(path, tolerance=1e-6):
+    """
+    Merge consecutive segments whose shared vertex lies within tolerance of the
+    straight line joining its neighbours
+    """
+    path = np.asarray(path, dtype=float)
+    if len(path) < 3:
+        return path.tolist()
+
+    kept = [path[0]]
+    for k in range(1, len(path) - 1):
+        deviation = compute_distance_points_to_segments(path[k], kept[-1], path[k + 1])[0, 0]
+        if deviation > tolerance:
+            kept.append(path[k])
+    kept.append(path[-1])
+    return np.array(kept).tolist()
+
+
+def fit_spline(path, obstacles, max_curvature=None, smoothing=0.0, n_samples=100):
+    """
+    Fit a smoothing B-spline through the path vertices and sample it
+
+    The sampled curve is accepted only if every segment between samples is
+    collision free and, when max_curvature is given, the curvature along the
+    curve stays below it. Returns the sampled points, or None if the spline
+    is rejected so the caller can keep the polyline.
+    """
+    path = np.asarray(path, dtype=float)
+    if len(path) < 3:
+        return None
+
+    degree = min(3, len(path) - 1)
+    tck, _ = interpolate.splprep(path.T, k=degree, s=smoothing)
+    u = np.linspace(0, 1, n_samples)
+    x, y = interpolate.splev(u, tck)
+    points = np.column_stack((x, y))
+
+    if max_curvature is not None:
+        dx, dy = interpolate.splev(u, tck, der=1)
+        ddx, ddy = interpolate.splev(u, tck, der=2)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            curvature = np.abs(dx * ddy - dy * ddx) / (dx * dx + dy * dy) ** 1.5
+        if not np.all(np.nan_to_num(curvature, nan=np.inf) <= max_curvature):
+            return None
+
+    if not is_segment_collision_free(obstacles, points[:-1], points[1:]):
+        return None
+    return points.tolist()
+
+
+def smooth_path(path, obstacles, iterations=0, tolerance=1e-6, rng=None):
+    """
+    Post-process a planner path: shortcut it against the obstacles, then merge
+    collinear segments. The order and end points of the path are preserved.
+    """
+    if path is None:
+        return None
+    return prune_collinear(shortcut_path(path, obstacles, iterations, rng), tolerance)
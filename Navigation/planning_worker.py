@@ -0,0 +1,110 @@
+import concurrent.futures
+import queue
+import threading
+
+import pygame
+
+
+class PlanningWorker(threading.Thread):
+    """
+    Background thread that plans waypoint legs for the pygame GUI
+
+    The GUI submits batches of legs and keeps running its event loop. Each
+    planned leg is posted back as a pygame event of type event_type with the
+    attributes generation, leg and path. Submitting a new batch supersedes the
+    previous one: the leg being planned is cancelled through its stop event and
+    queued legs of older batches are skipped, so results are only ever posted
+    for the latest generation.
+
+    With a pool (a parallel_planning.LegPlanner) batches of several legs are
+    planned in parallel on its worker processes instead. Legs of a superseded
+    batch that have not started are cancelled and running ones are stopped
+    through the pool's stop event. A leg that fails in its worker, or whose
+    worker dies, is posted with path None and the thread keeps serving batches.
+    """
+
+    def __init__(self, plan_leg, event_type, pool=None):
+        """
+        plan_leg: callable(start, end, stop_event) returning a path or None
+        event_type: pygame event type used to post results
+        pool: optional LegPlanner for batches of more than one leg
+        """
+        super().__init__(daemon=True)
+        self.plan_leg = plan_leg
+        self.event_type = event_type
+        self.pool = pool
+        self.requests = queue.Queue()
+        self.lock = threading.Lock()
+        self.generation = 0
+        self.stop_event = threading.Event()
+
+    def submit(self, legs):
+        """
+        Replace all outstanding work with a batch of (leg, start, end) requests.
+        Returns the generation number that results for this batch will carry.
+        """
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            self.stop_event.set()
+        self.requests.put((generation, list(legs)))
+        return generation
+
+    def shutdown(self):
+        with self.lock:
+            self.generation += 1
+            self.stop_event.set()
+        self.requests.put((None, None))
+        self.join()
+
+    def run(self):
+        while True:
+            generation, legs = self.requests.get()
+            if generation is None:
+                break
+
+            if self.pool is not None and len(legs) > 1:
+                self.run_parallel(generation, legs)
+                continue
+
+            for leg, start, end in legs:
+                with self.lock:
+                    if generation != self.generation:
+                        break  # superseded by a newer batch
+                    stop_event = threading.Event()
+                    self.stop_event = stop_event
+
+                path = self.plan_leg(start, end, stop_event)
+                if stop_event.is_set():
+                    break
+                self.post(generation, leg, path)
+
+    def run_parallel(self, generation, legs):
+        try:
+            futures = self.pool.submit(legs)
+        except Exception:
+            # e.g. a broken process pool, report every leg as failed
+            for leg, _, _ in legs:
+                self.post(generation, leg, None)
+            return
+        leg_of = {future: leg for future, (leg, _, _) in zip(futures, legs)}
+        pending = set(futures)
+        while pending:
+            done, pending = concurrent.futures.wait(pending, timeout=0.05,
+                                                    return_when=concurrent.futures.FIRST_COMPLETED)
+            with self.lock:
+                superseded = generation != self.generation
+            if superseded:
+                self.pool.cancel(pending)
+                return
+            for future in done:
+                # a leg that raised, or a worker that died, fails only that leg
+                try:
+                    path = future.result().path
+                except Exception:
+                    path = None
+                self.post(generation, leg_of[future], path)
+
+    def post(self, generation, leg, path):
+        pygame.event.post(pygame.event.Event(self.event_type, generation=generation,
+                                             leg=leg, path=path))
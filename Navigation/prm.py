@@ -0,0 +1,487 @@
+import copy
+import json
+import math
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from collision_world import are_points_in_collision, are_segments_in_collision
+from path_cache import file_hash, obstacle_hash
+
+# Bumped whenever the on-disk layout written by save_roadmap changes
+ROADMAP_FORMAT_VERSION = 1
+ROADMAP_ARRAYS = ("vertices", "indptr", "indices", "edge_costs", "obstacle_points")
+
+
+class RoadMap:
+    """
+    Probabilistic roadmap stored in compressed sparse row (CSR) form
+
+    The neighbours of vertex i are indices[indptr[i]:indptr[i+1]] and the
+    lengths of those edges edge_costs[indptr[i]:indptr[i+1]]. Every edge is
+    stored in both directions. edges gives the per-vertex neighbour lists and
+    obstacles is a cKDTree over points on the obstacles, the interface
+    path_search.breadth_first_search and path_animation.animate_path_prm use.
+    """
+
+    def __init__(self, vertices, indptr, indices, edge_costs, obstacles):
+        self.vertices = vertices
+        self.indptr = indptr
+        self.indices = indices
+        self.edge_costs = edge_costs
+        self.obstacles = obstacles
+        self.edge_index = None
+
+    def __len__(self):
+        return len(self.vertices)
+
+    @property
+    def edges(self):
+        return EdgeListView(self)
+
+    @property
+    def n_edges(self):
+        """
+        Number of undirected edges
+        """
+        return len(self.indices) // 2
+
+    def neighbours(self, index):
+        """
+        Return the neighbour indices of vertex index and the edge lengths to them
+        """
+        start, end = self.indptr[index], self.indptr[index + 1]
+        return self.indices[start:end], self.edge_costs[start:end]
+
+    def get_edge_pairs(self):
+        """
+        Every undirected edge once, as an (n_edges, 2) array of (i, j) with i < j
+        """
+        sources = np.repeat(np.arange(len(self), dtype=np.intp), np.diff(self.indptr))
+        targets = np.asarray(self.indices)
+        forward = sources < targets
+        return np.column_stack((sources[forward], targets[forward]))
+
+    def get_edge_index(self):
+        """
+        EdgeGrid over the roadmap edges, built on first use
+        """
+        if self.edge_index is None:
+            self.edge_index = EdgeGrid(self.vertices, self.get_edge_pairs())
+        return self.edge_index
+
+
+class EdgeListView:
+    """
+    Sequence of neighbour index arrays, one per roadmap vertex
+    """
+
+    def __init__(self, road_map):
+        self.road_map = road_map
+
+    def __len__(self):
+        return len(self.road_map)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self.road_map)
+        if not 0 <= index < len(self.road_map):
+            raise IndexError("vertex index out of range")
+        return self.road_map.neighbours(index)[0]
+
+    def __iter__(self):
+        for i in range(len(self.road_map)):
+            yield self.road_map.neighbours(i)[0]
+
+
+class EdgeGrid:
+    """
+    Uniform grid over the bounding boxes of roadmap edges
+
+    With cells at least as large as the longest edge every edge overlaps at
+    most 2 x 2 cells, so the grid is built with a few array operations and
+    stored as edge ids sorted by cell key rather than as per-cell lists.
+    """
+
+    def __init__(self, vertices, pairs, cell_size=None):
+        self.pairs = pairs
+        starts = np.asarray(vertices)[pairs[:, 0]]
+        ends = np.asarray(vertices)[pairs[:, 1]]
+        self.lower = np.minimum(starts, ends)
+        self.upper = np.maximum(starts, ends)
+
+        if cell_size is None:
+            cell_size = float(np.max(self.upper - self.lower)) if len(pairs) else 1.0
+            if cell_size <= 0:
+                cell_size = 1.0
+        self.cell_size = cell_size
+
+        cells_lower = np.floor(self.lower / cell_size).astype(np.int64)
+        cells_upper = np.floor(self.upper / cell_size).astype(np.int64)
+        self.origin = cells_lower.min(axis=0) if len(pairs) else np.zeros(2, dtype=np.int64)
+        self.n_rows = int(cells_upper[:, 1].max() - self.origin[1] + 1) if len(pairs) else 1
+        self.keys, self.ids = self._entries(self.lower, self.upper, np.arange(len(pairs)))
+
+    def _entries(self, lower, upper, edge_ids):
+        """
+        Cell keys of the edges with bounding boxes [lower, upper] and their ids, sorted by key
+        """
+        cells_lower = np.floor(lower / self.cell_size).astype(np.int64)
+        cells_upper = np.floor(upper / self.cell_size).astype(np.int64)
+        keys = []
+        ids = []
+        for di in (0, 1):
+            for dj in (0, 1):
+                cell = cells_lower + (di, dj)
+                valid = np.all(cell <= cells_upper, axis=1)
+                keys.append(self._key(cell[valid]))
+                ids.append(edge_ids[valid])
+        keys = np.concatenate(keys)
+        order = np.argsort(keys, kind='stable')
+        return keys[order], np.concatenate(ids)[order]
+
+    def updated(self, vertices, keep, pairs):
+        """
+        EdgeGrid after an edit of the roadmap, patched from this one
+
+        keep: boolean mask of the edges of this grid that remain
+        pairs: all edges after the edit, the kept ones first and in the same
+               order, followed by the new ones, with vertices renumbered
+        Kept edges keep their cells, so only the new edges are bucketed. The
+        grid is rebuilt instead when a new edge is longer than the cells or
+        lies outside the rows the cell keys can address.
+        """
+        new_pairs = pairs[np.count_nonzero(keep):]
+        starts = np.asarray(vertices)[new_pairs[:, 0]]
+        ends = np.asarray(vertices)[new_pairs[:, 1]]
+        lower, upper = np.minimum(starts, ends), np.maximum(starts, ends)
+        rows = np.floor(np.concatenate((lower[:, 1], upper[:, 1])) / self.cell_size)
+        if len(new_pairs) and (np.max(upper - lower) > self.cell_size or
+                               rows.min() < self.origin[1] or
+                               rows.max() >= self.origin[1] + self.n_rows):
+            return EdgeGrid(vertices, pairs)
+
+        grid = copy.copy(self)
+        grid.pairs = pairs
+        grid.lower = np.vstack((self.lower[keep], lower))
+        grid.upper = np.vstack((self.upper[keep], upper))
+        # Renumber the kept entries; dropping entries keeps them sorted by key
+        new_id = np.cumsum(keep) - 1
+        kept = keep[self.ids]
+        keys, ids = self.keys[kept], new_id[self.ids[kept]]
+        new_keys, new_ids = grid._entries(lower, upper, np.arange(np.count_nonzero(keep), len(pairs)))
+        at = np.searchsorted(keys, new_keys, side='right')
+        grid.keys = np.insert(keys, at, new_keys)
+        grid.ids = np.insert(ids, at, new_ids)
+        return grid
+
+    def _key(self, cells):
+        return (cells[:, 0] - self.origin[0]) * self.n_rows + (cells[:, 1] - self.origin[1])
+
+    def query_box(self, lower, upper):
+        """
+        Return the ids (rows of pairs) of edges whose bounding box overlaps [lower, upper]
+        """
+        i_min, j_min = np.floor(np.asarray(lower) / self.cell_size).astype(np.int64)
+        i_max, j_max = np.floor(np.asarray(upper) / self.cell_size).astype(np.int64)
+        j_min = max(j_min, self.origin[1])
+        j_max = min(j_max, self.origin[1] + self.n_rows - 1)
+        if j_min > j_max:
+            return np.empty(0, dtype=np.intp)
+
+        found = []
+        for i in range(i_min, i_max + 1):
+            cells = np.column_stack((np.full(j_max - j_min + 1, i), np.arange(j_min, j_max + 1)))
+            keys = self._key(cells)
+            first = np.searchsorted(self.keys, keys[0], side='left')
+            last = np.searchsorted(self.keys, keys[-1], side='right')
+            found.append(self.ids[first:last])
+        if not found:
+            return np.empty(0, dtype=np.intp)
+
+        candidates = np.unique(np.concatenate(found))
+        overlap = (np.all(self.lower[candidates] <= upper, axis=1) &
+                   np.all(self.upper[candidates] >= lower, axis=1))
+        return candidates[overlap]
+
+
+def get_obstacle_points(obstacles):
+    """
+    Polygon vertices and circle centres of all obstacles as an (n, 2) array
+    """
+    points = [np.asarray(obs.vertices, dtype=float) if hasattr(obs, "vertices")
+              else np.asarray(obs.center, dtype=float).reshape(1, 2) for obs in obstacles]
+    return np.vstack(points) if points else np.empty((0, 2))
+
+
+def sample_free_vertices(obstacles, width, height, n_samples, rng=None, max_rounds=100, origin=(0, 0)):
+    """
+    Draw up to n_samples collision-free points uniformly over the width x height
+    area with its lower corner at origin.
+    Points are drawn and checked in batches; fewer are returned if the free
+    space is too small to fill within max_rounds batches.
+    """
+    rng = np.random.default_rng(rng)
+    batches = []
+    n_found = 0
+    for _ in range(max_rounds):
+        if n_found >= n_samples:
+            break
+        candidates = rng.random((max(2 * (n_samples - n_found), 256), 2)) * (width, height) + origin
+        free = candidates[~are_points_in_collision(obstacles, candidates)]
+        batches.append(free)
+        n_found += len(free)
+    if not batches:
+        return np.empty((0, 2))
+    return np.vstack(batches)[:n_samples]
+
+
+def build_roadmap(obstacles, width, height, n_samples=500, k=10, radius=None,
+                  extra_vertices=None, batch_size=4096, rng=None):
+    """
+    Build a probabilistic roadmap over the width x height area
+
+    obstacles: obstacle list or obstacle-like object (CollisionWorld, OccupancyGrid)
+    n_samples: number of collision-free vertices to sample
+    k: connect every vertex to its k nearest neighbours; with k=None every pair
+       closer than radius is connected instead
+    radius: longest edge allowed, None for no limit (k must then be given)
+    extra_vertices: points such as start and goal added to the roadmap as they are
+    batch_size: number of candidate edges validated per vectorised collision check
+    rng: np.random.Generator or seed for the vertex samples
+    """
+    if k is None and radius is None:
+        raise ValueError("k or radius must be given")
+
+    vertices = sample_free_vertices(obstacles, width, height, n_samples, rng)
+    if extra_vertices is not None:
+        vertices = np.vstack((vertices, np.asarray(extra_vertices, dtype=float).reshape(-1, 2)))
+
+    pairs = find_candidate_pairs(vertices, k, radius)
+    pairs = pairs[get_free_pairs(obstacles, vertices, pairs, batch_size)]
+    return make_road_map(vertices, pairs, obstacles)
+
+
+def find_candidate_pairs(vertices, k, radius, rows=None):
+    """
+    Candidate edges as unique (i, j) pairs with i < j: each vertex with its k
+    nearest neighbours within radius, or with every vertex within radius when
+    k is None. With rows only the neighbours of those vertices are searched.
+    """
+    n = len(vertices)
+    tree = cKDTree(vertices)
+    if k is None and rows is None:
+        return tree.query_pairs(radius, output_type='ndarray').reshape(-1, 2)
+
+    rows = np.arange(n) if rows is None else np.asarray(rows, dtype=np.intp)
+    if k is None:
+        nbrs = tree.query_ball_point(vertices[rows], radius)
+        sources = np.repeat(rows, [len(nbr) for nbr in nbrs])
+        targets = np.fromiter((i for nbr in nbrs for i in nbr), dtype=np.intp, count=len(sources))
+    else:
+        bound = np.inf if radius is None else radius
+        _, nbrs = tree.query(vertices[rows], k=min(k + 1, n), distance_upper_bound=bound)
+        nbrs = np.asarray(nbrs).reshape(len(rows), -1)
+        sources = np.repeat(rows, nbrs.shape[1])
+        targets = nbrs.ravel()
+    # missing neighbours are reported as index n
+    keep = (targets < n) & (targets != sources)
+    sources, targets = sources[keep], targets[keep]
+    keys = np.unique(np.minimum(sources, targets).astype(np.int64) * n + np.maximum(sources, targets))
+    return np.column_stack((keys // n, keys % n)).astype(np.intp)
+
+
+def get_free_pairs(obstacles, vertices, pairs, batch_size=4096):
+    """
+    Boolean mask of the collision-free edges, checked batch_size edges at a time
+    """
+    free = np.ones(len(pairs), dtype=bool)
+    for start in range(0, len(pairs), batch_size):
+        batch = pairs[start:start + batch_size]
+        free[start:start + batch_size] = ~are_segments_in_collision(
+            obstacles, vertices[batch[:, 0]], vertices[batch[:, 1]])
+    return free
+
+
+def make_road_map(vertices, pairs, obstacles):
+    """
+    Assemble a RoadMap from its vertices and unique undirected (i, j) edges
+    """
+    n = len(vertices)
+    # Both directions of every edge, grouped by source vertex
+    sources = np.concatenate((pairs[:, 0], pairs[:, 1]))
+    targets = np.concatenate((pairs[:, 1], pairs[:, 0]))
+    order = np.argsort(sources.astype(np.int64) * n + targets)
+    sources, targets = sources[order], targets[order]
+    indptr = np.zeros(n + 1, dtype=np.intp)
+    np.cumsum(np.bincount(sources, minlength=n), out=indptr[1:])
+    edge_costs = np.hypot(*(vertices[targets] - vertices[sources]).T)
+
+    return RoadMap(vertices, indptr, targets.astype(np.intp), edge_costs,
+                   cKDTree(get_obstacle_points(obstacles)))
+
+
+def update_roadmap(road_map, obstacles, added=(), removed=(), k=10, radius=None,
+                   margin=None, batch_size=4096, rng=None):
+    """
+    Repair a roadmap after obstacles were added or removed, without rebuilding it
+
+    obstacles: the complete obstacle set after the change
+    added, removed: the obstacles that changed
+    k, radius: connection rule for new vertices, as in build_roadmap
+    margin: how far around a changed obstacle vertices are resampled, defaults
+            to the longest roadmap edge
+
+    Only the neighbourhood of the changed obstacles is touched. Vertices inside
+    added obstacles are dropped, and the edges crossing them are found through
+    the roadmap's EdgeGrid and dropped. The bounding boxes of all changed
+    obstacles, grown by margin, are then topped up with new vertices to the
+    roadmap's vertex density, filling the largest gaps first, so repeated
+    updates do not keep adding vertices. The new vertices are
+    connected to their neighbours, which restores connectivity around added
+    obstacles and fills space freed by removed ones. Returns a new RoadMap
+    that carries the patched EdgeGrid.
+    """
+    if k is None and radius is None:
+        raise ValueError("k or radius must be given")
+
+    vertices = np.asarray(road_map.vertices, dtype=float)
+    edge_index = road_map.get_edge_index()
+    pairs = edge_index.pairs
+    if margin is None:
+        margin = float(np.max(road_map.edge_costs)) if len(road_map.edge_costs) else 0.0
+
+    keep_vertex = np.ones(len(vertices), dtype=bool)
+    keep_edge = np.ones(len(pairs), dtype=bool)
+    for obs in added:
+        box = obs.get_bounding_box()
+        inside = np.flatnonzero(np.all((vertices >= box[:2]) & (vertices <= box[2:]), axis=1))
+        keep_vertex[inside[are_points_in_collision((obs,), vertices[inside])]] = False
+
+        near = edge_index.query_box(box[:2], box[2:])
+        near = near[keep_edge[near]]
+        keep_edge[near[are_segments_in_collision(
+            (obs,), vertices[pairs[near, 0]], vertices[pairs[near, 1]])]] = False
+    keep_edge &= keep_vertex[pairs[:, 0]] & keep_vertex[pairs[:, 1]]
+
+    # Vertex density of the roadmap before the change
+    density = 0.0
+    if len(vertices):
+        extent = np.maximum(vertices.max(axis=0) - vertices.min(axis=0), 1e-9)
+        density = len(vertices) / (extent[0] * extent[1])
+
+    # Renumber the surviving vertices
+    new_index = np.cumsum(keep_vertex) - 1
+    vertices = vertices[keep_vertex]
+    pairs = new_index[pairs[keep_edge]].reshape(-1, 2)
+
+    # Top up the neighbourhood of every changed obstacle to that density:
+    # sample its free space as densely as build_roadmap did and keep as many
+    # samples as the vertices there fall short, those farthest from any vertex
+    rng = np.random.default_rng(rng)
+    n_old = len(vertices)
+    for obs in list(added) + list(removed):
+        box = obs.get_bounding_box()
+        lower, upper = box[:2] - margin, box[2:] + margin
+        samples = rng.random((int(math.ceil(density * np.prod(upper - lower))), 2)) * (upper - lower) + lower
+        samples = samples[~are_points_in_collision(obstacles, samples)]
+        present = np.count_nonzero(np.all((vertices >= lower) & (vertices <= upper), axis=1))
+        missing = len(samples) - present
+        if missing > 0 and len(vertices):
+            gaps, _ = cKDTree(vertices).query(samples)
+            samples = samples[np.argsort(-gaps, kind='stable')[:missing]]
+        if missing > 0:
+            vertices = np.vstack((vertices, samples[:missing]))
+
+    if len(vertices) > n_old:
+        candidates = find_candidate_pairs(vertices, k, radius, rows=np.arange(n_old, len(vertices)))
+        candidates = candidates[get_free_pairs(obstacles, vertices, candidates, batch_size)]
+        # every candidate has a new vertex, so none duplicates a kept edge
+        pairs = np.vstack((pairs, candidates))
+
+    road_map = make_road_map(vertices, pairs, obstacles)
+    road_map.edge_index = edge_index.updated(vertices, keep_edge, pairs)
+    return road_map
+
+
+def save_roadmap(road_map, directory, map_hash=None, params=None):
+    """
+    Write a roadmap to directory as one .npy file per array plus meta.json
+
+    map_hash: digest of the map the roadmap was built for (see path_cache.file_hash)
+    params: build parameters, stored so load_roadmap can reject other settings
+    The metadata is written last, so an interrupted save is never loaded.
+    """
+    os.makedirs(directory, exist_ok=True)
+    meta_file = os.path.join(directory, "meta.json")
+    if os.path.exists(meta_file):
+        os.remove(meta_file)
+
+    arrays = {"vertices": road_map.vertices,
+              "indptr": road_map.indptr,
+              "indices": road_map.indices,
+              "edge_costs": road_map.edge_costs,
+              "obstacle_points": road_map.obstacles.data}
+    for name in ROADMAP_ARRAYS:
+        np.save(os.path.join(directory, name + ".npy"), np.ascontiguousarray(arrays[name]))
+
+    meta = {"version": ROADMAP_FORMAT_VERSION,
+            "map_hash": map_hash,
+            "params": params,
+            "n_vertices": len(road_map),
+            "n_edges": road_map.n_edges}
+    with open(meta_file + ".tmp", 'w') as f:
+        json.dump(meta, f, indent=2, default=repr)
+    os.replace(meta_file + ".tmp", meta_file)
+
+
+def load_roadmap(directory, map_hash=None, params=None, mmap=True):
+    """
+    Open a roadmap written by save_roadmap
+
+    With mmap the vertex, edge and cost arrays are memory-mapped read-only
+    instead of read, so opening costs the same whatever the roadmap size.
+    Returns None if there is no roadmap in directory, or it was written in
+    another format version, or for another map_hash or params when given.
+    """
+    meta_file = os.path.join(directory, "meta.json")
+    if not os.path.exists(meta_file):
+        return None
+    with open(meta_file, 'r') as f:
+        meta = json.load(f)
+
+    if meta.get("version") != ROADMAP_FORMAT_VERSION:
+        return None
+    if map_hash is not None and meta.get("map_hash") != map_hash:
+        return None
+    if params is not None and meta.get("params") != json.loads(json.dumps(params, default=repr)):
+        return None
+
+    mmap_mode = 'r' if mmap else None
+    arrays = {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode)
+              for name in ROADMAP_ARRAYS}
+    return RoadMap(arrays["vertices"], arrays["indptr"], arrays["indices"], arrays["edge_costs"],
+                   cKDTree(np.array(arrays["obstacle_points"])))
+
+
+def load_or_build_roadmap(map_file, obstacles, width, height, directory, **kwargs):
+    """
+    Load the roadmap stored in directory for map_file, or build it with
+    build_roadmap(obstacles, width, height, **kwargs) and store it there when
+    it is missing or was built for another version of the map, other obstacles
+    (e.g. another inflation) or other settings
+
+    Only an integer rng identifies the vertex samples. A np.random.Generator
+    gives different samples depending on its state, so like rng=None it
+    accepts any stored roadmap built with the same settings.
+    """
+    map_hash = file_hash(map_file)
+    rng = kwargs.get("rng")
+    params = dict(kwargs, width=width, height=height, obstacles=obstacle_hash(obstacles),
+                  rng=int(rng) if isinstance(rng, (int, np.integer)) else None)
+    road_map = load_roadmap(directory, map_hash, params)
+    if road_map is None:
+        road_map = build_roadmap(obstacles, width, height, **kwargs)
+        save_roadmap(road_map, directory, map_hash, params)
+    return road_map
@@ -1,6 +1,12 @@
+import copy
 import math
 import numpy as np
 
+from collision_world import query_points, query_segments
+from rrt_tree import RRTTree
+from sampling import BlockRandom, make_sampler
+from spatial_index import make_nearest_neighbour_index
+
 class RRT:
     """
     Class for RRT planning
@@ -25,15 +31,29 @@ class RRT:
                  height=100,
                  expand_dis=3.0, 
                  path_resolution=0.5, 
-                 max_points=200):
+                 max_points=200,
+                 nn_backend="kdtree",
+                 continuous_collision=False,
+                 sampler="uniform",
+                 rng=None):
         """
         Setting Parameter
         start:Start Position [x,y]
         goal:Goal Position [x,y]
-        obstacle_list: list of obstacle objects
+        obstacle_list: list of obstacle objects, or a single object with
+                       is_in_collision_with_points such as a CollisionWorld
         width, height: search area
         expand_dis: min distance between random node and closest node in rrt to it
         path_resolion: step size to considered when looking for node to expand
+        nn_backend: nearest neighbour index used to pick the node to expand,
+                    either a name from spatial_index.NEAREST_NEIGHBOUR_BACKENDS
+                    ("kdtree", "brute") or an index object with add/nearest/clear
+        continuous_collision: check each edge as a whole segment against the
+                              obstacles instead of its path_resolution samples
+        sampler: sampling strategy, a name from sampling.SAMPLERS ("uniform",
+                 "goal_bias", "gaussian_line", "informed") or a sampler object
+        rng: np.random.Generator or seed for np.random.default_rng. Every
+             planner draws from its own generator, None seeds it from the OS.
         """
         self.start = self.Node(start[0], start[1])
         self.end = self.Node(goal[0], goal[1])
@@ -43,7 +63,17 @@ class RRT:
         self.path_resolution = path_resolution
         self.max_nodes = max_points
         self.obstacle_list = obstacle_list
+        self.tree = RRTTree()
         self.node_list = []
+        self.nn_backend = nn_backend
+        self.nn_index = None
+        self.continuous_collision = continuous_collision
+        self.sampler = make_sampler(sampler)
+        self.rng = np.random.default_rng(rng)
+        # samplers draw their numbers from here, in blocks rather than one call per number
+        self.random = BlockRandom(self.rng)
+        # Optional threading.Event, planning gives up and returns None once it is set
+        self.stop_event = None
 
     def planning(self, animation=True):
         """
@@ -51,15 +81,24 @@ class RRT:
         animation: flag for animation on or off
         """
 
-        self.node_list = [self.start]
-        while len(self.node_list) <= self.max_nodes:
+        self.sampler.reset()
+        self.tree.clear()
+        self.tree.add(self.start.x, self.start.y)
+        # node_list is a lightweight view onto self.tree
+        self.node_list = self.tree.nodes
+        self.nn_index = make_nearest_neighbour_index(self.nn_backend)
+        self.nn_index.add(self.start.x, self.start.y)
+        goal_checked_ind = None
+        while len(self.tree) <= self.max_nodes:
+            if self.is_stopped():
+                return None
             
             # 1. Generate a random node           
             rnd_node = self.get_random_node()
             
             # 2. Find node in tree that is closest to sampled node.
             # This is the node to be expanded (q_expansion)
-            expansion_ind = self.get_nearest_node_index(self.node_list, rnd_node)
+            expansion_ind = self.nn_index.nearest(rnd_node.x, rnd_node.y)
             expansion_node = self.node_list[expansion_ind]
 
             # 3. Select a node (nearby_node) close to expansion_node by moving from expantion_node to rnd_node
@@ -67,15 +106,24 @@ class RRT:
             nearby_node = self.steer(expansion_node, rnd_node, self.expand_dis)
             
             # 4. Check if nearby_node is in free space (i.e., it is collision free). If collision free, add node
-            # to self.node_list
+            # to the tree
             if self.is_collision_free(nearby_node):
-                self.node_list.append(nearby_node)
+                self.tree.add(nearby_node.x, nearby_node.y, expansion_ind,
+                              nearby_node.path_x, nearby_node.path_y)
+                self.nn_index.add(nearby_node.x, nearby_node.y)
             
-            # If we are close to goal, stop expansion and generate path
-            if self.calc_dist_to_goal(self.node_list[-1].x, self.node_list[-1].y) <= self.expand_dis:
-                final_node = self.steer(self.node_list[-1], self.end, self.expand_dis)
+            # If we are close to goal, stop expansion and generate path.
+            # A node that already failed to reach the goal will fail again, so
+            # only new nodes are steered towards it.
+            last_ind = len(self.tree) - 1
+            if last_ind == goal_checked_ind:
+                continue
+            goal_checked_ind = last_ind
+            last_node = self.node_list[last_ind]
+            if self.calc_dist_to_goal(last_node.x, last_node.y) <= self.expand_dis:
+                final_node = self.steer(last_node, self.end, self.expand_dis)
                 if self.is_collision_free(final_node):
-                    return self.generate_final_course(len(self.node_list) - 1)
+                    return self.generate_final_course(last_ind)
 
         return None  # cannot find path
 
@@ -90,26 +138,36 @@ class RRT:
         d, theta = self.calc_distance_and_angle(new_node, to_node)
         cos_theta, sin_theta = np.cos(theta), np.sin(theta)
 
-        new_node.path_x = [new_node.x]
-        new_node.path_y = [new_node.y]
-
         if extend_length > d:
             extend_length = d
 
         # How many intermediate positions are considered between from_node and to_node
         n_expand = math.floor(extend_length / self.path_resolution)
 
-        # Compute all intermediate positions
-        for _ in range(n_expand):
-            new_node.x += self.path_resolution * cos_theta
-            new_node.y += self.path_resolution * sin_theta
-            new_node.path_x.append(new_node.x)
-            new_node.path_y.append(new_node.y)
+        if self.continuous_collision:
+            # Edges are checked as whole segments, so only their end points are kept
+            samples = np.empty((3, 2))
+            samples[0] = (new_node.x, new_node.y)
+            samples[1] = samples[0] + n_expand * self.path_resolution * np.array([cos_theta, sin_theta])
+            last = 1
+        else:
+            # Compute all intermediate positions with a running sum of the step, which
+            # reproduces repeatedly adding path_resolution to the current position.
+            # One spare row is kept for snapping onto to_node.
+            samples = np.empty((n_expand + 2, 2))
+            samples[0] = (new_node.x, new_node.y)
+            samples[1:n_expand + 1] = (self.path_resolution * cos_theta, self.path_resolution * sin_theta)
+            np.cumsum(samples[:n_expand + 1], axis=0, out=samples[:n_expand + 1])
+            last = n_expand
+        new_node.x, new_node.y = samples[last]
 
         d, _ = self.calc_distance_and_angle(new_node, to_node)
         if d <= self.path_resolution:
-            new_node.path_x.append(to_node.x)
-            new_node.path_y.append(to_node.y)
+            samples[last + 1] = (to_node.x, to_node.y)
+        else:
+            samples = samples[:last + 1]
+        new_node.path_x = samples[:, 0]
+        new_node.path_y = samples[:, 1]
 
         new_node.parent = from_node
 
@@ -124,12 +182,9 @@ class RRT:
             return True
 
         points = np.vstack((new_node.path_x, new_node.path_y)).T
-        for obs in self.obstacle_list:
-            in_collision = obs.is_in_collision_with_points(points)
-            if in_collision:
-                return False
-        
-        return True  # safe
+        if self.continuous_collision:
+            return not query_segments(self.obstacle_list, points[:-1], points[1:])
+        return not query_points(self.obstacle_list, points)
         
     
     def generate_final_course(self, goal_ind):
@@ -137,22 +192,20 @@ class RRT:
         Reconstruct path from start to end node
         """
         path = [[self.end.x, self.end.y]]
-        node = self.node_list[goal_ind]
-        while node.parent is not None:
-            path.append([node.x, node.y])
-            node = node.parent
-        path.append([node.x, node.y])
+        path.extend(self.tree.coords[self.tree.get_branch(goal_ind)].tolist())
 
         return path
 
+    def is_stopped(self):
+        return self.stop_event is not None and self.stop_event.is_set()
+
     def calc_dist_to_goal(self, x, y):
         dx = x - self.end.x
         dy = y - self.end.y
         return math.hypot(dx, dy)
 
     def get_random_node(self):
-        x = self.width * np.random.random_sample()
-        y = self.height * np.random.random_sample()
+        x, y = self.sampler.sample(self)
         rnd = self.Node(x, y)
         return rnd
 
@@ -172,4 +225,121 @@ class RRT:
         dy = to_node.y - from_node.y
         d = math.hypot(dx, dy) #returns the Euclidean norm
         theta = math.atan2(dy, dx)
-        return d, theta    
\ No newline at end of file
+        return d, theta
+
+
+class RRTC(RRT):
+    """
+    Class for RRT-Connect (bidirectional) planning
+
+    Grows one tree from the start and one from the goal. Each iteration extends
+    one tree towards a random sample and then greedily extends the other tree
+    towards the new node until it is reached or blocked. The trees swap roles
+    after every iteration.
+    """
+
+    def __init__(self, start=np.zeros(2),
+                 goal=np.array([120,90]),
+                 obstacle_list=None,
+                 width = 160,
+                 height=100,
+                 expand_dis=3.0, 
+                 path_resolution=0.5, 
+                 max_points=200,
+                 nn_backend="kdtree",
+                 continuous_collision=False,
+                 sampler="uniform",
+                 rng=None):
+        """
+        Same parameters as RRT, max_points counts the nodes of both trees
+        """
+        super().__init__(start=start, goal=goal, obstacle_list=obstacle_list,
+                         width=width, height=height, expand_dis=expand_dis,
+                         path_resolution=path_resolution, max_points=max_points,
+                         nn_backend=nn_backend, continuous_collision=continuous_collision,
+                         sampler=sampler, rng=rng)
+        self.start_tree = RRTTree()
+        self.end_tree = RRTTree()
+        self.start_node_list = []
+        self.end_node_list = []
+
+    def planning(self, animation=True):
+        """
+        rrt-connect path planning
+        animation: flag for animation on or off
+        """
+
+        self.sampler.reset()
+        # Each tree is a (storage, nearest neighbour index) pair
+        trees = []
+        for tree, root, backend in ((self.start_tree, self.start, self.nn_backend),
+                                    (self.end_tree, self.end, copy.deepcopy(self.nn_backend))):
+            tree.clear()
+            tree.add(root.x, root.y)
+            nn_index = make_nearest_neighbour_index(backend)
+            nn_index.add(root.x, root.y)
+            trees.append((tree, nn_index))
+        self.start_node_list = self.start_tree.nodes
+        self.end_node_list = self.end_tree.nodes
+
+        tree_a, tree_b = trees
+        while len(self.start_tree) + len(self.end_tree) <= self.max_nodes:
+            if self.is_stopped():
+                return None
+
+            # 1. Extend tree_a towards a random node
+            rnd_node = self.get_random_node()
+            new_ind = self.extend(tree_a, rnd_node)
+
+            # 2. Greedily grow tree_b towards the new node until it is reached or blocked
+            if new_ind is not None:
+                new_node = tree_a[0].nodes[new_ind]
+                connect_ind = self.connect(tree_b, new_node)
+                if connect_ind is not None:
+                    if tree_a[0] is self.start_tree:
+                        return self.generate_final_course(new_ind, connect_ind)
+                    return self.generate_final_course(connect_ind, new_ind)
+
+            # 3. Swap the roles of the trees
+            tree_a, tree_b = tree_b, tree_a
+
+        return None  # cannot find path
+
+    def extend(self, tree, to_node):
+        """
+        Add a node to tree by steering its closest node towards to_node.
+        Returns the index of the new node, or None if the edge is in collision.
+        """
+        storage, nn_index = tree
+        expansion_ind = nn_index.nearest(to_node.x, to_node.y)
+        new_node = self.steer(storage.nodes[expansion_ind], to_node, self.expand_dis)
+        if not self.is_collision_free(new_node):
+            return None
+        nn_index.add(new_node.x, new_node.y)
+        return storage.add(new_node.x, new_node.y, expansion_ind, new_node.path_x, new_node.path_y)
+
+    def connect(self, tree, to_node):
+        """
+        Repeatedly extend tree towards to_node.
+        Returns the index of the node whose edge reaches to_node, or None if blocked.
+        """
+        while len(self.start_tree) + len(self.end_tree) <= self.max_nodes:
+            new_ind = self.extend(tree, to_node)
+            if new_ind is None:
+                return None
+            new_node = tree[0].nodes[new_ind]
+            d, _ = self.calc_distance_and_angle(new_node, to_node)
+            # steer snaps the edge onto to_node once it is within path_resolution
+            if d <= self.path_resolution:
+                return new_ind
+        return None
+
+    def generate_final_course(self, start_ind, end_ind):
+        """
+        Reconstruct path from the goal to the start through the two connected nodes
+        """
+        end_branch = self.end_tree.coords[self.end_tree.get_branch(end_ind)]
+        start_branch = self.start_tree.coords[self.start_tree.get_branch(start_ind)]
+        path = np.vstack((end_branch[::-1], start_branch))
+
+        return path.tolist()
@@ -0,0 +1,191 @@
+import math
+import time
+import numpy as np
+
+from rrt import RRT
+from rrt_tree import RRTTree
+from spatial_index import make_nearest_neighbour_index
+
+
+class RRTStar(RRT):
+    """
+    Class for anytime RRT* planning
+
+    Like RRT, but every new node is attached to the neighbour that gives it the
+    cheapest path from the start, and nearby nodes are rewired through the new
+    node when that shortens their path. The neighbourhood radius shrinks with
+    the number of nodes. Planning does not stop at the first solution: the best
+    path keeps improving until the time or iteration budget runs out, and every
+    improvement is reported through a callback.
+    """
+
+    def __init__(self, start=np.zeros(2),
+                 goal=np.array([120,90]),
+                 obstacle_list=None,
+                 width = 160,
+                 height=100,
+                 expand_dis=3.0,
+                 path_resolution=0.5,
+                 max_points=200,
+                 nn_backend="kdtree",
+                 continuous_collision=False,
+                 sampler="uniform",
+                 connect_circle_dist=None,
+                 rng=None):
+        """
+        Same parameters as RRT, plus
+        connect_circle_dist: scale gamma of the rewiring radius
+                             gamma * sqrt(log(n) / n), capped at expand_dis.
+                             Defaults to the RRT* bound for the search area.
+        """
+        super().__init__(start=start, goal=goal, obstacle_list=obstacle_list,
+                         width=width, height=height, expand_dis=expand_dis,
+                         path_resolution=path_resolution, max_points=max_points,
+                         nn_backend=nn_backend, continuous_collision=continuous_collision,
+                         sampler=sampler, rng=rng)
+        if connect_circle_dist is None:
+            # gamma > 2 * (1 + 1/d)^(1/d) * (area / unit ball area)^(1/d) for d = 2
+            connect_circle_dist = 2 * math.sqrt(1.5) * math.sqrt(width * height / math.pi)
+        self.connect_circle_dist = connect_circle_dist
+        self.costs = np.empty(64)
+        self.best_goal_ind = None
+        self.best_cost = math.inf
+
+    def planning(self, animation=True, max_time=None, max_iter=None, callback=None):
+        """
+        anytime rrt* path planning
+        animation: flag for animation on or off
+        max_time: wall-clock budget in seconds
+        max_iter: budget in sampling iterations
+        callback: called as callback(path, cost) every time a cheaper path is found
+        Planning also stops once the tree holds max_points nodes or stop_event is
+        set. Returns the best path found, or None.
+        """
+        deadline = None if max_time is None else time.perf_counter() + max_time
+
+        self.sampler.reset()
+        self.tree.clear()
+        self.tree.add(self.start.x, self.start.y)
+        self.node_list = self.tree.nodes
+        self.costs[0] = 0.0
+        self.nn_index = make_nearest_neighbour_index(self.nn_backend)
+        self.nn_index.add(self.start.x, self.start.y)
+        self.best_goal_ind = None
+        self.best_cost = math.inf
+        goal_inds = []
+
+        iteration = 0
+        while len(self.tree) <= self.max_nodes:
+            if max_iter is not None and iteration >= max_iter:
+                break
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            if self.is_stopped():
+                break
+            iteration += 1
+
+            # 1. Sample and steer from the nearest node, as in RRT
+            rnd_node = self.get_random_node()
+            nearest_ind = self.nn_index.nearest(rnd_node.x, rnd_node.y)
+            new_node = self.steer(self.node_list[nearest_ind], rnd_node, self.expand_dis)
+            if not self.is_collision_free(new_node):
+                continue
+
+            # 2. Attach the new node to its cheapest collision-free neighbour
+            near_inds = self.find_near_nodes(new_node)
+            if nearest_ind not in near_inds:
+                near_inds.append(nearest_ind)
+            new_ind = self.add_node_with_best_parent(new_node, near_inds)
+            if new_ind is None:
+                continue
+
+            # 3. Route neighbours through the new node when that is cheaper
+            self.rewire(new_ind, near_inds)
+
+            # 4. Keep track of nodes that connect to the goal and the best of them
+            if self.calc_dist_to_goal(new_node.x, new_node.y) <= self.expand_dis:
+                final_node = self.steer(self.node_list[new_ind], self.end, self.expand_dis)
+                if self.is_collision_free(final_node):
+                    goal_inds.append(new_ind)
+            if goal_inds and self.update_best_goal(goal_inds) and callback is not None:
+                callback(self.generate_final_course(self.best_goal_ind), self.best_cost)
+
+        if self.best_goal_ind is None:
+            return None  # cannot find path
+        return self.generate_final_course(self.best_goal_ind)
+
+    def find_near_nodes(self, new_node):
+        """
+        Indices of tree nodes inside the shrinking rewiring radius around new_node
+        """
+        n = len(self.tree) + 1
+        radius = min(self.connect_circle_dist * math.sqrt(math.log(n) / n), self.expand_dis)
+        return self.nn_index.near(new_node.x, new_node.y, radius)
+
+    def add_node_with_best_parent(self, new_node, near_inds):
+        """
+        Add new_node under the near node giving the lowest cost from the start.
+        Returns the new index, or None if no near node has a collision-free edge.
+        """
+        best_cost = math.inf
+        best_edge = None
+        best_ind = None
+        for ind in near_inds:
+            near_node = self.node_list[ind]
+            cost = self.costs[ind] + math.hypot(new_node.x - near_node.x, new_node.y - near_node.y)
+            if cost >= best_cost:
+                continue
+            edge = self.steer(near_node, new_node)
+            if self.is_collision_free(edge):
+                best_cost, best_edge, best_ind = cost, edge, ind
+
+        if best_ind is None:
+            return None
+
+        new_ind = self.tree.add(new_node.x, new_node.y, best_ind, best_edge.path_x, best_edge.path_y)
+        if new_ind == self.costs.shape[0]:
+            self.costs = RRTTree._grow(self.costs, new_ind + 1)
+        self.costs[new_ind] = best_cost
+        self.nn_index.add(new_node.x, new_node.y)
+        return new_ind
+
+    def rewire(self, new_ind, near_inds):
+        new_node = self.node_list[new_ind]
+        for ind in near_inds:
+            near_node = self.node_list[ind]
+            cost = self.costs[new_ind] + math.hypot(new_node.x - near_node.x, new_node.y - near_node.y)
+            if cost >= self.costs[ind]:
+                continue
+            edge = self.steer(new_node, near_node)
+            if not self.is_collision_free(edge):
+                continue
+            self.tree.set_parent(ind, new_ind, edge.path_x, edge.path_y)
+            self.propagate_cost_to_leaves(ind, cost - self.costs[ind])
+
+    def propagate_cost_to_leaves(self, ind, delta):
+        """
+        Shift the cost of node ind and all its descendants by delta
+        """
+        n = len(self.tree)
+        parents = self.tree.parents[:n]
+        frontier = np.array([ind])
+        while len(frontier):
+            self.costs[frontier] += delta
+            frontier = np.flatnonzero(np.isin(parents, frontier))
+
+    def update_best_goal(self, goal_inds):
+        """
+        Pick the goal-connected node with the cheapest total path.
+        Returns True if the best path improved.
+        """
+        inds = np.array(goal_inds)
+        coords = self.tree.coords[inds]
+        total = self.costs[inds] + np.hypot(coords[:, 0] - self.end.x, coords[:, 1] - self.end.y)
+        best = int(np.argmin(total))
+        if total[best] >= self.best_cost:
+            return False
+
+        self.best_goal_ind = int(inds[best])
+        self.best_cost = float(total[best])
+        self.sampler.update_solution(self.best_cost)
+        return True
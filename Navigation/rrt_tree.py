@@ -0,0 +1,193 @@
+import numpy as np
+
+
+class RRTTree:
+    """
+    Compact array-backed storage for an RRT tree
+
+    Node coordinates and parent indices live in preallocated NumPy arrays and
+    the edge samples (path_x, path_y) of every node are packed into one flat
+    buffer, addressed by a per-node offset and length. All buffers grow by
+    doubling, so adding a node never allocates per-node Python objects.
+    Parent index -1 marks the root.
+
+    Re-attaching a node (RRT* rewiring) overwrites its edge samples in place
+    when the new edge has no more samples than the old one, and appends them
+    otherwise. Samples left behind are compacted away once they outnumber the
+    live ones, so the buffer stays within twice the live samples.
+    """
+
+    def __init__(self, capacity=64, sample_capacity=1024):
+        self.coords = np.empty((capacity, 2))
+        self.parents = np.empty(capacity, dtype=np.intp)
+        self.path_offsets = np.empty(capacity, dtype=np.intp)
+        self.path_lengths = np.empty(capacity, dtype=np.intp)
+        self.samples = np.empty((sample_capacity, 2))
+        self.size = 0
+        self.sample_size = 0
+        # samples in the buffer no longer referenced by any node
+        self.dead_samples = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        """
+        Drop all nodes but keep the allocated buffers for the next planning run
+        """
+        self.size = 0
+        self.sample_size = 0
+        self.dead_samples = 0
+
+    @staticmethod
+    def _grow(array, required):
+        capacity = array.shape[0]
+        while capacity < required:
+            capacity *= 2
+        grown = np.empty((capacity,) + array.shape[1:], dtype=array.dtype)
+        grown[:array.shape[0]] = array
+        return grown
+
+    def _store_path(self, index, path_x, path_y):
+        n = len(path_x)
+        end = self.sample_size + n
+        if end > self.samples.shape[0]:
+            self.samples = self._grow(self.samples, end)
+        self.samples[self.sample_size:end, 0] = path_x
+        self.samples[self.sample_size:end, 1] = path_y
+        self.path_offsets[index] = self.sample_size
+        self.path_lengths[index] = n
+        self.sample_size = end
+
+    def add(self, x, y, parent=-1, path_x=(), path_y=()):
+        """
+        Append a node and return its index
+        parent: index of the parent node, -1 for the root
+        path_x, path_y: edge samples from the parent to this node
+        """
+        index = self.size
+        if index == self.coords.shape[0]:
+            self.coords = self._grow(self.coords, index + 1)
+            self.parents = self._grow(self.parents, index + 1)
+            self.path_offsets = self._grow(self.path_offsets, index + 1)
+            self.path_lengths = self._grow(self.path_lengths, index + 1)
+        self.coords[index] = (x, y)
+        self.parents[index] = parent
+        self._store_path(index, path_x, path_y)
+        self.size += 1
+        return index
+
+    def set_parent(self, index, parent, path_x=(), path_y=()):
+        """
+        Re-attach node index to a new parent with a new incoming edge
+        """
+        self.parents[index] = parent
+        n = len(path_x)
+        old_n = self.path_lengths[index]
+        if n <= old_n:
+            start = self.path_offsets[index]
+            self.samples[start:start + n, 0] = path_x
+            self.samples[start:start + n, 1] = path_y
+            self.path_lengths[index] = n
+        else:
+            self._store_path(index, path_x, path_y)
+        self.dead_samples += old_n - min(n, old_n)
+        if 2 * self.dead_samples > self.sample_size:
+            self._compact()
+
+    def _compact(self):
+        """
+        Move the live edge samples to the front of the buffer, in node order
+        """
+        lengths = self.path_lengths[:self.size]
+        offsets = np.zeros(self.size, dtype=np.intp)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        live = int(lengths.sum())
+        gather = np.arange(live) + np.repeat(self.path_offsets[:self.size] - offsets, lengths)
+        self.samples[:live] = self.samples[gather]
+        self.path_offsets[:self.size] = offsets
+        self.sample_size = live
+        self.dead_samples = 0
+
+    def get_path(self, index):
+        """
+        Return the edge samples (path_x, path_y) leading into node index
+        """
+        start = self.path_offsets[index]
+        edge = self.samples[start:start + self.path_lengths[index]]
+        return edge[:, 0], edge[:, 1]
+
+    def get_branch(self, index):
+        """
+        Return the node indices from index back to the root
+        """
+        branch = [index]
+        parent = self.parents[index]
+        while parent >= 0:
+            branch.append(int(parent))
+            parent = self.parents[parent]
+        return branch
+
+    @property
+    def nodes(self):
+        return NodeListView(self)
+
+
+class NodeView:
+    """
+    Read-only stand-in for RRT.Node backed by an RRTTree slot
+    """
+
+    __slots__ = ("tree", "index")
+
+    def __init__(self, tree, index):
+        self.tree = tree
+        self.index = index
+
+    @property
+    def x(self):
+        return self.tree.coords[self.index, 0]
+
+    @property
+    def y(self):
+        return self.tree.coords[self.index, 1]
+
+    @property
+    def path_x(self):
+        return self.tree.get_path(self.index)[0]
+
+    @property
+    def path_y(self):
+        return self.tree.get_path(self.index)[1]
+
+    @property
+    def parent(self):
+        parent = self.tree.parents[self.index]
+        if parent < 0:
+            return None
+        return NodeView(self.tree, int(parent))
+
+
+class NodeListView:
+    """
+    Sequence of NodeView objects so existing node_list consumers keep working
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+
+    def __len__(self):
+        return len(self.tree)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [NodeView(self.tree, i) for i in range(*index.indices(len(self.tree)))]
+        if index < 0:
+            index += len(self.tree)
+        if not 0 <= index < len(self.tree):
+            raise IndexError("node index out of range")
+        return NodeView(self.tree, index)
+
+    def __iter__(self):
+        for i in range(len(self.tree)):
+            yield NodeView(self.tree, i)
@@ -0,0 +1,180 @@
+import math
+
+
+class BlockRandom:
+    """
+    Scalar random numbers served from blocks pre-generated by a np.random.Generator
+
+    Drawing one number per Generator call costs far more than the number
+    itself, so uniform and standard normal numbers are generated block_size at
+    a time and handed out one by one. The sequence only depends on the
+    generator's seed.
+    """
+
+    def __init__(self, rng, block_size=1024):
+        self.rng = rng
+        self.block_size = block_size
+        self.uniform = []
+        self.uniform_pos = 0
+        self.normal = []
+        self.normal_pos = 0
+
+    def random(self):
+        """
+        Uniform number in [0, 1)
+        """
+        if self.uniform_pos == len(self.uniform):
+            self.uniform = self.rng.random(self.block_size).tolist()
+            self.uniform_pos = 0
+        self.uniform_pos += 1
+        return self.uniform[self.uniform_pos - 1]
+
+    def standard_normal(self):
+        """
+        Normally distributed number with mean 0 and standard deviation 1
+        """
+        if self.normal_pos == len(self.normal):
+            self.normal = self.rng.standard_normal(self.block_size).tolist()
+            self.normal_pos = 0
+        self.normal_pos += 1
+        return self.normal[self.normal_pos - 1]
+
+
+class UniformSampler:
+    """
+    Uniform samples over the planner's width x height search area
+
+    Samplers draw from planner.random, the planner's own BlockRandom, so
+    planners never share random state.
+    """
+
+    def sample(self, planner):
+        x = planner.width * planner.random.random()
+        y = planner.height * planner.random.random()
+        return x, y
+
+    def update_solution(self, cost):
+        """
+        Called by optimising planners whenever a cheaper path to the goal is found
+        """
+        pass
+
+    def reset(self):
+        """
+        Called by planners at the start of every planning call, so state learned
+        from an earlier leg does not carry over when a sampler object is reused
+        """
+        pass
+
+
+class GoalBiasedSampler(UniformSampler):
+    """
+    Returns the goal itself with probability goal_sample_rate, otherwise a uniform sample
+    """
+
+    def __init__(self, goal_sample_rate=0.1):
+        if not 0 <= goal_sample_rate <= 1:
+            raise ValueError("goal_sample_rate must be between 0 and 1")
+        self.goal_sample_rate = goal_sample_rate
+
+    def sample(self, planner):
+        if planner.random.random() < self.goal_sample_rate:
+            return planner.end.x, planner.end.y
+        return super().sample(planner)
+
+
+class GaussianLineSampler(UniformSampler):
+    """
+    Samples concentrated around the straight line from start to goal
+
+    A point is drawn uniformly along the start-goal segment and pushed sideways
+    by a normally distributed offset with standard deviation sigma (defaults to
+    a quarter of the start-goal distance). Samples are clipped to the search area.
+    """
+
+    def __init__(self, sigma=None):
+        self.sigma = sigma
+
+    def sample(self, planner):
+        dx = planner.end.x - planner.start.x
+        dy = planner.end.y - planner.start.y
+        length = math.hypot(dx, dy)
+        if length == 0:
+            return super().sample(planner)
+
+        sigma = self.sigma if self.sigma is not None else length / 4
+        t = planner.random.random()
+        offset = sigma * planner.random.standard_normal()
+        x = planner.start.x + t * dx - offset * dy / length
+        y = planner.start.y + t * dy + offset * dx / length
+        return min(max(x, 0), planner.width), min(max(y, 0), planner.height)
+
+
+class InformedSampler(UniformSampler):
+    """
+    Informed sampling for optimising planners
+
+    Until a first solution exists this samples like base_sampler (uniform by
+    default). Once update_solution has reported a path cost c_best, samples are
+    drawn uniformly from the ellipse with foci at start and goal and major axis
+    c_best, the only region that can still shorten the path. Samples outside the
+    search area are redrawn.
+    """
+
+    def __init__(self, base_sampler=None, max_tries=100):
+        self.base_sampler = base_sampler if base_sampler is not None else UniformSampler()
+        self.max_tries = max_tries
+        self.best_cost = math.inf
+
+    def update_solution(self, cost):
+        self.best_cost = min(self.best_cost, cost)
+        self.base_sampler.update_solution(cost)
+
+    def reset(self):
+        self.best_cost = math.inf
+        self.base_sampler.reset()
+
+    def sample(self, planner):
+        dx = planner.end.x - planner.start.x
+        dy = planner.end.y - planner.start.y
+        c_min = math.hypot(dx, dy)
+        if not math.isfinite(self.best_cost) or self.best_cost <= c_min:
+            return self.base_sampler.sample(planner)
+
+        # Semi-axes of the ellipse, aligned with the start-goal line
+        r_major = self.best_cost / 2
+        r_minor = math.sqrt(self.best_cost ** 2 - c_min ** 2) / 2
+        centre_x = (planner.start.x + planner.end.x) / 2
+        centre_y = (planner.start.y + planner.end.y) / 2
+        cos_a, sin_a = dx / c_min, dy / c_min
+
+        for _ in range(self.max_tries):
+            # Uniform point in the unit disc, stretched onto the ellipse
+            r = math.sqrt(planner.random.random())
+            phi = 2 * math.pi * planner.random.random()
+            u, v = r_major * r * math.cos(phi), r_minor * r * math.sin(phi)
+            x = centre_x + u * cos_a - v * sin_a
+            y = centre_y + u * sin_a + v * cos_a
+            if 0 <= x <= planner.width and 0 <= y <= planner.height:
+                return x, y
+
+        return self.base_sampler.sample(planner)
+
+
+SAMPLERS = {
+    "uniform": UniformSampler,
+    "goal_bias": GoalBiasedSampler,
+    "gaussian_line": GaussianLineSampler,
+    "informed": InformedSampler,
+}
+
+
+def make_sampler(sampler):
+    """
+    Build a sampler from a name in SAMPLERS or return the given sampler object
+    """
+    if not isinstance(sampler, str):
+        return sampler
+    if sampler not in SAMPLERS:
+        raise ValueError("Unknown sampler: {}".format(sampler))
+    return SAMPLERS[sampler]()
@@ -0,0 +1,161 @@
+import math
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+class BruteForceIndex:
+    """
+    Nearest neighbour index that scans every stored point
+
+    Points are kept in a growable NumPy array so the scan is a single
+    vectorised expression instead of a Python list comprehension.
+    Ties are broken by insertion order (lowest index wins), exactly like
+    RRT.get_nearest_node_index.
+    """
+
+    def __init__(self, capacity=64):
+        self.points = np.empty((capacity, 2))
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def clear(self):
+        self.size = 0
+
+    def add(self, x, y):
+        if self.size == self.points.shape[0]:
+            grown = np.empty((2 * self.points.shape[0], 2))
+            grown[:self.size] = self.points[:self.size]
+            self.points = grown
+        self.points[self.size] = (x, y)
+        self.size += 1
+        return self.size - 1
+
+    def nearest(self, x, y):
+        """
+        Return the index of the stored point closest to (x, y)
+        """
+        if self.size == 0:
+            return None
+        pts = self.points[:self.size]
+        dist = (pts[:, 0] - x) ** 2 + (pts[:, 1] - y) ** 2
+        return int(np.argmin(dist))
+
+    def near(self, x, y, radius):
+        """
+        Return the indices of all stored points within radius of (x, y), in insertion order
+        """
+        pts = self.points[:self.size]
+        dist = (pts[:, 0] - x) ** 2 + (pts[:, 1] - y) ** 2
+        return np.flatnonzero(dist <= radius ** 2).tolist()
+
+
+class KDTreeIndex(BruteForceIndex):
+    """
+    Nearest neighbour index over a batch-rebuilt cKDTree
+
+    The k-d tree covers the points up to the last rebuild. Points added since
+    form a tail that is scanned like BruteForceIndex, and the tree is rebuilt
+    once the tail holds more than TAIL_FACTOR * sqrt(n) points. Queries then
+    cost O(log n) in the tree plus O(sqrt n) in the tail.
+
+    A single cKDTree query costs about as much as a NumPy scan of SCAN_POINTS
+    points, so smaller indexes are scanned and the tree is only built once
+    there are SCAN_POINTS points. Below that, e.g. the GUI's 200-node trees,
+    this index is a linear scan exactly like BruteForceIndex; the tree only
+    pays off for trees of tens of thousands of nodes.
+
+    Results are identical to BruteForceIndex: distances are compared with the
+    same expression and ties are broken by insertion order.
+    """
+
+    SCAN_POINTS = 8192
+    TAIL_FACTOR = 8
+
+    def __init__(self, capacity=64):
+        super().__init__(capacity)
+        self.tree = None
+        self.built = 0
+
+    def clear(self):
+        super().clear()
+        self.tree = None
+        self.built = 0
+
+    def add(self, x, y):
+        idx = super().add(x, y)
+        tail = self.size - self.built
+        if self.size >= self.SCAN_POINTS and tail > self.TAIL_FACTOR * math.sqrt(self.built):
+            self.tree = cKDTree(self.points[:self.size])
+            self.built = self.size
+        return idx
+
+    def _distances(self, indices, x, y):
+        pts = self.points[indices]
+        return (pts[:, 0] - x) ** 2 + (pts[:, 1] - y) ** 2
+
+    def nearest(self, x, y):
+        """
+        Return the index of the stored point closest to (x, y)
+        """
+        if self.tree is None:
+            return super().nearest(x, y)
+
+        # The tree's two nearest points; if their distances are too close for
+        # rounding to order them the same way as the scan, look at all points
+        # that close instead
+        dists, inds = self.tree.query((x, y), k=2)
+        if dists[1] > dists[0] * (1 + 1e-9) + 1e-12:
+            best_ind = int(inds[0])
+            px, py = self.points[best_ind].tolist()
+            best_d = (px - x) ** 2 + (py - y) ** 2
+        else:
+            candidates = np.sort(self.tree.query_ball_point((x, y), dists[0] * (1 + 1e-9) + 1e-12))
+            d = self._distances(candidates, x, y)
+            best = int(np.argmin(d))
+            best_ind, best_d = int(candidates[best]), d[best]
+
+        if self.size > self.built:
+            tail = self.points[self.built:self.size]
+            d = (tail[:, 0] - x) ** 2 + (tail[:, 1] - y) ** 2
+            i = int(np.argmin(d))
+            # tail points come later, so they must be strictly closer
+            if d[i] < best_d:
+                best_ind = self.built + i
+        return best_ind
+
+    def near(self, x, y, radius):
+        """
+        Return the indices of all stored points within radius of (x, y), in insertion order
+        """
+        if self.tree is None:
+            return super().near(x, y, radius)
+
+        # slightly larger ball, then the scan's exact test
+        candidates = np.sort(np.asarray(self.tree.query_ball_point((x, y), radius * (1 + 1e-9) + 1e-12),
+                                        dtype=np.intp))
+        found = candidates[self._distances(candidates, x, y) <= radius ** 2].tolist()
+        if self.size > self.built:
+            tail = self.points[self.built:self.size]
+            d = (tail[:, 0] - x) ** 2 + (tail[:, 1] - y) ** 2
+            found += (self.built + np.flatnonzero(d <= radius ** 2)).tolist()
+        return found
+
+
+NEAREST_NEIGHBOUR_BACKENDS = {
+    "brute": BruteForceIndex,
+    "kdtree": KDTreeIndex,
+}
+
+
+def make_nearest_neighbour_index(backend):
+    """
+    Build a nearest neighbour index from a backend name or return the given index
+    """
+    if not isinstance(backend, str):
+        backend.clear()
+        return backend
+    if backend not in NEAREST_NEIGHBOUR_BACKENDS:
+        raise ValueError("Unknown nearest neighbour backend: {}".format(backend))
+    return NEAREST_NEIGHBOUR_BACKENDS[backend]()
@@ -6,12 +6,21 @@ import math
 
 from Obstacle import *
 from rrt import *
+from occupancy_grid import OccupancyGrid
+from path_smoothing import smooth_path
+from planning_worker import PlanningWorker
+from parallel_planning import LegPlanner
+from path_cache import PathCache, obstacle_hash
+from cspace import build_cspace, load_baseline
 
 from Practical03_Support.path_animation import *
 import meshcat.geometry as g
 import meshcat.transformations as tf
 from ece4078.Utility import StartMeshcat
 
+# posted by the planning worker when a leg has been planned
+PATH_READY = pygame.USEREVENT + 1
+
 class Game:
     '''
     Class for waypoint GUI and planning
@@ -39,7 +48,26 @@ class Game:
         # marker size is 70x70mm
         self.marker_size = 0.07
 
+        # one path per leg, the leg i ends at waypoint i. None while it is being planned
         self.paths = []
+        self.worker = None
+        self.plan_generation = None
+
+        # cell size in pixels of the precomputed occupancy grid, 0 disables it
+        self.grid_res = args.grid_res
+        # processes used to replan several legs at once, 0 plans them one by one
+        self.workers = args.workers
+
+        # planned legs by end points, optionally kept on disk across runs
+        self.path_cache = PathCache(directory=args.path_cache or None)
+        self.obstacles_hash = None
+
+        self.planner_kwargs = dict(width=self.width,
+                                   height=self.height,
+                                   expand_dis=100,
+                                   path_resolution=0.1,
+                                   continuous_collision=True,
+                                   sampler="goal_bias")
 
         pygame.init()
     
@@ -196,15 +224,13 @@ class Game:
         ind = self.waypoints.index(waypoint)
         self.waypoints.remove(waypoint)
 
-        self.paths = self.paths[:ind]
-
-        if ind == 0:
-            self.paths.append(self.generate_path((self.width/2, self.height/2), self.waypoints[0]))
-            for i in range(0, len(self.waypoints)-1):
-                self.paths.append(self.generate_path(self.waypoints[i], self.waypoints[i+1]))
+        # the two legs meeting at the removed waypoint become one bridging leg,
+        # the later legs keep their end points and their paths
+        if ind < len(self.waypoints):
+            self.paths = self.paths[:ind] + [None] + self.paths[ind+2:]
         else:
-            for i in range(ind-1, len(self.waypoints)-1):
-                self.paths.append(self.generate_path(self.waypoints[i], self.waypoints[i+1]))
+            self.paths = self.paths[:ind]
+        self.request_paths()
         self.draw_paths()
         
 
@@ -214,7 +240,7 @@ class Game:
         self.draw_grid()
 
         for obstacle in self.all_obstacles:
-            pygame.draw.rect(self.canvas, (211,211,211), pygame.Rect(obstacle.origin[0],obstacle.origin[1], obstacle.width, obstacle.height))
+            pygame.draw.polygon(self.canvas, (211,211,211), obstacle.vertices)
 
         self.draw_markers()
         self.draw_waypoints()
@@ -239,23 +265,37 @@ class Game:
 
         self.load()
 
-        with open('baseline.txt', 'r') as f:
-            self.baseline = np.loadtxt(f, delimiter=',')
+        self.baseline = load_baseline('baseline.txt')
         print(self.baseline)
 
-        self.all_obstacles = []
-        # for circle in self.fruit_locs:
-        #     width = self.baseline * self.scale_factor
-        #     self.all_obstacles.append(Rectangle([circle[0] - width/2, circle[1] - width/2], width, width))
-        #     pygame.draw.rect(self.canvas, (211,211,211), pygame.Rect(circle[0] - width/2, circle[1] - width/2, width, width))
-        for marker in self.marker_locs:
-            width = (self.marker_size + self.baseline) * self.scale_factor
-            marker_width = self.marker_size * self.scale_factor
-    
-            self.all_obstacles.append(Rectangle([marker[0] - width/2, marker[1]-width/2], width+marker_width, width+marker_width))
-            
+        # markers grown by half the marker size plus half the baseline, in canvas pixels.
+        # Fruit are the targets, so they are not obstacles
+        self.cspace = build_cspace(self.map_file, 'baseline.txt',
+                                   inflation=(self.marker_size + self.baseline) / 2,
+                                   include_fruit=False,
+                                   marker_size=self.marker_size,
+                                   transform=(-self.scale_factor, self.scale_factor, self.width/2, self.height/2))
+        self.all_obstacles = self.cspace.obstacles
+        self.collision_world = self.cspace.world
+        self.planning_obstacles = self.collision_world
+        if self.grid_res > 0:
+            # Obstacles only change when the map is loaded, so rasterise them once
+            self.planning_obstacles = OccupancyGrid(self.all_obstacles, self.width, self.height,
+                                                    resolution=self.grid_res)
+
+        self.obstacles_hash = obstacle_hash(self.planning_obstacles)
+
         self.reset_canvas()
-        
+
+        # plan on a background thread so the window keeps responding
+        pool = None
+        if self.workers > 0:
+            pool = LegPlanner(self.planning_obstacles, RRT, self.planner_kwargs,
+                              postprocess=smooth_path, max_workers=self.workers)
+        self.worker = PlanningWorker(self.generate_path, PATH_READY, pool)
+        self.worker.start()
+        clock = pygame.time.Clock()
+
         running = True
 
         while running:
@@ -275,22 +315,34 @@ class Game:
                             self.write_waypoints()
 
                             pygame.display.set_caption(f'{mouse_pos[0]}, {mouse_pos[1]}')
+                    elif event.type == PATH_READY:
+                        # results of superseded requests are dropped
+                        if event.generation == self.plan_generation:
+                            self.paths[event.leg] = event.path if event.path is not None else []
+                            if event.path is not None:
+                                self.path_cache.put(self.get_leg_key(event.leg), event.path)
+                            self.draw_paths()
                     elif event.type == pygame.QUIT:
                         running = False
 
+            clock.tick(60)
+
+        self.worker.shutdown()
+        if pool is not None:
+            pool.shutdown(cancel=True)
+
 
     '''
     Functions for RRT planning from now on
     '''
-    def generate_path(self, start, end):
-        rrt = RRT(start=start, 
-                  goal=end, 
-                  width=self.width, 
-                  height=self.height, 
-                  obstacle_list=self.all_obstacles,
-                  expand_dis=100, 
-                  path_resolution=0.1)
-        path = rrt.planning()
+    def generate_path(self, start, end, stop_event=None):
+        rrt = RRT(start=start,
+                  goal=end,
+                  obstacle_list=self.planning_obstacles,
+                  **self.planner_kwargs)
+        rrt.stop_event = stop_event
+        # shortcut the tree path and merge collinear segments before driving it
+        path = smooth_path(rrt.planning(), self.planning_obstacles)
         # vis = StartMeshcat()
         # vis.delete()
         # vis.Set2DView(scale = 20, center = [-1, 16, 12, 0])
@@ -304,23 +356,52 @@ class Game:
 
         self.reset_canvas()
         for path in self.paths:
+            # legs still being planned or without a path are skipped
+            if not path:
+                continue
             for i in range(len(path) - 1):
                 pygame.draw.circle(self.canvas, (0,0,0), path[i], 3)
                 pygame.draw.line(self.canvas, (0,0,0), path[i], path[i+1], width = 2)
             pygame.draw.circle(self.canvas, (0,0,0), path[-1], 3)
 
 
-    def path_planning(self):
+    def get_leg(self, i):
         '''
-        Function for RRT planning
+        Start and end of the leg leading to waypoint i
         '''
-        
-        if len(self.paths) == 0:
-            self.paths.append(self.generate_path((self.width/2, self.height/2), self.waypoints[0]))
-            
+        if i == 0:
+            start = (self.width/2, self.height/2)
         else:
-            self.paths.append(self.generate_path(self.waypoints[-2], self.waypoints[-1]))
+            start = (self.waypoints[i-1][0], self.waypoints[i-1][1])
+        return start, (self.waypoints[i][0], self.waypoints[i][1])
+
+
+    def get_leg_key(self, i):
+        '''
+        Path cache key of the leg leading to waypoint i
+        '''
+        start, end = self.get_leg(i)
+        return self.path_cache.make_key(start, end, self.obstacles_hash, self.planner_kwargs)
+
+
+    def request_paths(self):
+        '''
+        Fill legs without a path from the cache and send the rest to the planning
+        worker, superseding earlier requests
+        '''
+        for i, path in enumerate(self.paths):
+            if path is None:
+                self.paths[i] = self.path_cache.get(self.get_leg_key(i))
+        legs = [(i,) + self.get_leg(i) for i, path in enumerate(self.paths) if path is None]
+        self.plan_generation = self.worker.submit(legs)
 
+
+    def path_planning(self):
+        '''
+        Function for RRT planning
+        '''
+        self.paths.append(None)
+        self.request_paths()
         self.draw_paths()
 
 if __name__ == '__main__':
@@ -329,6 +410,9 @@ if __name__ == '__main__':
     parser = argparse.ArgumentParser()
     parser.add_argument("--arena", metavar='', type=int, default=0)
     parser.add_argument("--map", metavar='', type=str, default='M4_true_map.txt')
+    parser.add_argument("--grid_res", metavar='', type=float, default=0)
+    parser.add_argument("--workers", metavar='', type=int, default=0)
+    parser.add_argument("--path_cache", metavar='', type=str, default='')
     args, _ = parser.parse_known_args()
 
     game = Game(args)